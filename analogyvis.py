@@ -0,0 +1,239 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+# Only the standard library is imported here, every subcommand imports what it needs when it runs
+
+root_dir = os.path.dirname(os.path.abspath(__file__))
+analysis_dir = os.path.join(root_dir, 'analysis')
+contour_dir = os.path.join(root_dir, 'contourMap')
+
+# Every run appends one record per stage to this report
+report_path = os.path.join(root_dir, '.cache', 'reports', 'runs.json')
+# Same default as analysis/state.py, which imports pandas
+state_path = os.path.join(analysis_dir, '.cache', 'state.sqlite')
+
+
+def file_size(path):
+    return os.path.getsize(path) if path and os.path.isfile(path) else 0
+
+
+def run_filter(args):
+    from exports import read_export, required_columns
+
+    columns = args.columns or required_columns
+    rows = 0
+    with open(args.output, mode='w', newline='', encoding='utf-8') as outfile:
+        writer = csv.DictWriter(outfile, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for row in read_export(args.input, columns):
+            writer.writerow(row)
+            rows += 1
+    print(f"{rows} responses saved to: {args.output}")
+    return {'rows': rows, 'bytes_read': file_size(args.input)}
+
+
+def run_resolve_sketches(args):
+    from pipeline import run_pipeline
+
+    data = run_pipeline(args.input, args.sketches_dir, args.output, full=args.full, state_path=args.state)
+    sketches = data[['actual', 'analogy']].stack().dropna()
+    print(f"{len(data)} participants saved to: {args.output}")
+    return {'rows': len(data), 'images': len(sketches), 'bytes_read': file_size(args.input)}
+
+
+def run_overlay(args):
+    from overlay_images import run_overlays
+
+    # Only the composites written in this run count, the up-to-date ones are skipped without reading them
+    processed = run_overlays(args.table, args.output_dir, workers=args.workers, state_path=args.state)
+    return {'images': processed, 'bytes_read': file_size(args.table)}
+
+
+def run_timers(args):
+    from getNewTable import build_table
+
+    result_df = build_table(args.input, args.output, full=args.full, sketch_scores=args.sketch_scores,
+                            state_path=args.state)
+    return {'rows': len(result_df), 'bytes_read': file_size(args.input)}
+
+
+def run_vark(args):
+    from qualtrics import load_export
+    from vark import score_vark, vark_counts
+
+    data = load_export(args.input)
+    scores = vark_counts(data)
+    scores.insert(0, 'ResponseId', data['ResponseId'])
+    scores['VARK'] = score_vark(data, policy=args.policy, threshold=args.threshold)
+    scores.to_csv(args.output, index=False)
+    print(f"VARK scores saved to: {args.output}")
+    return {'rows': len(scores), 'bytes_read': file_size(args.input)}
+
+
+def run_massvis(args):
+    sys.path.insert(0, root_dir)
+    from massVis import group_counts, parse_where, plot_type_frequencies
+
+    frequencies = group_counts(args.csv, by=args.by, where=parse_where(args.where), use_cache=not args.no_cache)
+    print(frequencies)
+    plot_type_frequencies(frequencies, args.output, xlabel=' / '.join(dimension.capitalize() for dimension in args.by))
+    return {'rows': sum(frequencies.values()), 'images': 1, 'bytes_read': file_size(args.csv)}
+
+
+def run_contour(args):
+    sys.path.insert(0, contour_dir)
+    from contour import boundaries_path, load_boundaries, plot_contours
+
+    boundaries = load_boundaries(args.scale, offline=args.offline)
+    for resolution in args.resolution:
+        plot_contours(boundaries, resolution, args.levels, args.chunk_rows, args.output.format(resolution=resolution))
+    return {'rows': sum(resolution ** 2 for resolution in args.resolution), 'images': len(args.resolution),
+            'bytes_read': file_size(boundaries_path(args.scale))}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='analogyvis', description="AnalogyVis analysis pipeline.")
+    parser.add_argument("--report", default=report_path, help="JSON run report the stage timings are appended to")
+    parser.add_argument("--no-report", action="store_true", help="Don't write the run report")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also trace the peak of Python allocations (slows the stage down)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('filter', help="Keep only some columns of a Qualtrics export")
+    command.add_argument("--input", required=True, help="Qualtrics export CSV")
+    command.add_argument("--output", default='filtered_pilot.csv', help="Output CSV")
+    command.add_argument("--columns", nargs='+', default=None, help="Columns to keep (default: the pipeline's)")
+    command.set_defaults(handler=run_filter)
+
+    command = commands.add_parser('resolve-sketches', help="Add the sketch paths and write the pipeline artifact")
+    command.add_argument("--input", required=True, help="Qualtrics export CSV")
+    command.add_argument("--sketches-dir", default=os.environ.get('ANALOGYVIS_SKETCHES_DIR'),
+                         required='ANALOGYVIS_SKETCHES_DIR' not in os.environ,
+                         help="Folder with one subfolder of sketches per task (default: $ANALOGYVIS_SKETCHES_DIR)")
+    command.add_argument("--output", default=os.path.join(analysis_dir, 'filtered_pilot.feather'), help="Artifact")
+    command.add_argument("--full", action="store_true", help="Resolve every response again")
+    command.add_argument("--state", default=state_path, help="State store of the earlier runs")
+    command.set_defaults(handler=run_resolve_sketches)
+
+    command = commands.add_parser('overlay', help="Overlay the sketches onto the chart backgrounds")
+    command.add_argument("--table", default=os.path.join(analysis_dir, 'filtered_pilot.feather'), help="Artifact")
+    command.add_argument("--output-dir", default=os.path.join(analysis_dir, 'annotations'), help="Composites folder")
+    command.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    command.add_argument("--state", default=state_path, help="State store of the earlier runs")
+    command.set_defaults(handler=run_overlay)
+
+    command = commands.add_parser('timers', help="Build dataAnalysis.csv from the timers and VARK answers")
+    command.add_argument("--input", required=True, help="Qualtrics export CSV")
+    command.add_argument("--output", default='dataAnalysis.csv', help="Output CSV")
+    command.add_argument("--full", action="store_true", help="Recompute every response")
+    command.add_argument("--sketch-scores", default=os.path.join(analysis_dir, 'sketchScores.csv'),
+                         help="Sketch scores, written to AutoSketchScore")
+    command.add_argument("--state", default=state_path, help="State store of the earlier runs")
+    command.set_defaults(handler=run_timers)
+
+    command = commands.add_parser('vark', help="Score the VARK questionnaire")
+    command.add_argument("--input", required=True, help="Qualtrics export CSV")
+    command.add_argument("--output", default='varkScores.csv', help="Output CSV")
+    command.add_argument("--policy", default='dominant', choices=['dominant', 'multimodal'], help="Scoring policy")
+    command.add_argument("--threshold", type=int, default=10, help="Multimodal threshold")
+    command.set_defaults(handler=run_vark)
+
+    command = commands.add_parser('massvis', help="Count the MassVis charts")
+    command.add_argument("--csv", default=os.path.join(root_dir, 'single2k_metadata.csv'), help="Metadata CSV")
+    command.add_argument("--by", nargs='+', default=['type'], choices=['source', 'category', 'type'])
+    command.add_argument("--where", nargs='*', default=[], metavar='DIMENSION=VALUE', help="Only count these charts")
+    command.add_argument("--output", default='massVisTypes.png', help="Bar chart")
+    command.add_argument("--no-cache", action="store_true", help="Re-read the CSV")
+    command.set_defaults(handler=run_massvis)
+
+    command = commands.add_parser('contour', help="Draw contour maps of the United States")
+    command.add_argument("--resolution", type=int, nargs='+', default=[50], help="Grid points per axis, one map each")
+    command.add_argument("--levels", type=int, default=5, help="Number of contour lines")
+    command.add_argument("--chunk-rows", type=int, default=None, help="Evaluate the field this many rows at a time")
+    command.add_argument("--output", default='contour_{resolution}.png', help="Output file, {resolution} is filled in")
+    command.add_argument("--scale", default='50m', choices=['10m', '50m', '110m'], help="Natural Earth scale")
+    command.add_argument("--offline", action="store_true", help="Fail instead of downloading the boundaries")
+    command.set_defaults(handler=run_contour)
+    return parser
+
+
+def max_rss_bytes(children=False):
+    """
+    Peak resident set size of this process, or of its largest finished worker, in bytes.
+    None where the resource module is missing.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes everywhere but on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def run_stage(args, trace_memory=False):
+    """
+    Runs a subcommand and returns its record: wall time, the rows/images/bytes the handler reports
+    and the peak resident memory of the process and of its workers. Every invocation runs one stage,
+    so the process peak is the stage's. The peak of Python allocations is only traced if trace_memory is set.
+    """
+    sys.path.insert(0, analysis_dir)
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        counts = args.handler(args) or {}
+    finally:
+        seconds = time.perf_counter() - start
+        traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return {
+        'stage': args.command,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(time.time() - seconds)),
+        'argv': sys.argv[1:],
+        'wall_seconds': round(seconds, 6),
+        'rows': counts.get('rows'),
+        'images': counts.get('images'),
+        'bytes_read': counts.get('bytes_read'),
+        'max_rss_bytes': max_rss_bytes(),
+        'max_rss_children_bytes': max_rss_bytes(children=True),
+        'traced_peak_bytes': traced_peak,
+    }
+
+
+def append_report(record, path=report_path):
+    # Read-modify-replace, so a crashed run never leaves a half-written report
+    records = []
+    if os.path.exists(path):
+        with open(path, mode='r', encoding='utf-8') as report_file:
+            records = json.load(report_file)
+    records.append(record)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode='w', encoding='utf-8') as report_file:
+        json.dump(records, report_file, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    args = build_parser().parse_args()
+    record = run_stage(args, trace_memory=args.trace_memory)
+    print(f"{record['stage']}: {record['wall_seconds']:.3f} s, {record['rows']} rows, {record['images']} images, "
+          f"{record['bytes_read']} bytes read, max RSS {record['max_rss_bytes']} bytes "
+          f"(workers {record['max_rss_children_bytes']} bytes)")
+    if not args.no_report:
+        append_report(record, args.report)
+
+
+if __name__ == '__main__':
+    main()
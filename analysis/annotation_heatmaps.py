@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from backgrounds import background_charts, load_background
+from pipeline import pilot_table, read_table
+
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+heatmap_dir = os.path.join(analysis_dir, 'heatmaps')
+
+techniques = ['actual', 'analogy']
+
+
+def heatmap_paths(chart_type, technique, heatmap_dir=heatmap_dir):
+    base = os.path.join(heatmap_dir, f"{chart_type}_{technique}")
+    return {'sum': base + '_sum.npy', 'density': base + '_density.npy', 'index': base + '.json', 'image': base + '.png'}
+
+
+def sketch_version(sketch_path):
+    """
+    Returns [path, mtime] of a sketch, or None if it is gone.
+    """
+    try:
+        return [sketch_path, os.path.getmtime(sketch_path)]
+    except OSError:
+        return None
+
+
+def load_accumulator(paths, size):
+    """
+    Returns (sum of the sketch alphas, {ResponseId: [path, mtime]} of the sketches already added) for a heatmap,
+    empty if it doesn't exist yet or was built for another background size.
+    """
+    width, height = size
+    if os.path.exists(paths['sum']) and os.path.exists(paths['index']):
+        with open(paths['index'], mode='r', encoding='utf-8') as index_file:
+            index = json.load(index_file)
+        if tuple(index['size']) == (width, height) and 'sketches' in index:
+            return np.load(paths['sum']), index['sketches']
+    return np.zeros((height, width), dtype=np.float64), {}
+
+
+def render_heatmap(background, density):
+    """
+    Blends the density (0..1 share of participants drawing on each pixel) over the chart background,
+    from transparent through red to yellow at the maximum.
+    """
+    peak = density.max()
+    level = density / peak if peak > 0 else density
+    heat = np.zeros(density.shape + (4,), dtype=np.uint8)
+    heat[..., 0] = 255
+    heat[..., 1] = (255 * level).astype(np.uint8)
+    heat[..., 3] = (200 * np.sqrt(level)).astype(np.uint8)
+    return Image.alpha_composite(background, Image.fromarray(heat))
+
+
+def update_heatmap(chart_type, technique, sketches, background, heatmap_dir=heatmap_dir):
+    """
+    Adds the sketches ({ResponseId: path}) that are not in the heatmap yet, decoding one at a time so memory
+    stays constant, then saves the accumulator, the density array and the rendered overlay.
+    A sum can't be taken apart again, so if a sketch already in the heatmap was replaced, deleted or is no
+    longer listed, the heatmap is rebuilt from scratch. Returns the number of sketches added.
+    """
+    os.makedirs(heatmap_dir, exist_ok=True)
+    paths = heatmap_paths(chart_type, technique, heatmap_dir)
+    chart = load_background(background)
+    total, added_sketches = load_accumulator(paths, chart.size)
+
+    stale = [response_id for response_id, version in added_sketches.items()
+             if response_id not in sketches or sketch_version(sketches[response_id]) != version]
+    if stale:
+        print(f"{chart_type}/{technique}: {len(stale)} sketches changed or were removed, rebuilding the heatmap")
+        total, added_sketches = np.zeros_like(total), {}
+
+    added = 0
+    for response_id, sketch_path in sketches.items():
+        if response_id in added_sketches:
+            continue
+        try:
+            with Image.open(sketch_path) as sketch:
+                alpha = sketch.convert("RGBA").resize(chart.size, Image.Resampling.LANCZOS).getchannel("A")
+        except OSError as e:
+            print(f"Skipping {sketch_path}: {e}")
+            continue
+        total += np.asarray(alpha, dtype=np.float64) / 255
+        added_sketches[response_id] = sketch_version(sketch_path)
+        added += 1
+
+    if added == 0 and not stale and os.path.exists(paths['image']):
+        print(f"{chart_type}/{technique}: heatmap up to date ({len(added_sketches)} sketches)")
+        return 0
+
+    density = total / max(len(added_sketches), 1)
+    np.save(paths['sum'], total)
+    np.save(paths['density'], density.astype(np.float32))
+    with open(paths['index'], mode='w', encoding='utf-8') as index_file:
+        json.dump({'size': list(chart.size), 'count': len(added_sketches), 'sketches': added_sketches}, index_file)
+    render_heatmap(chart, density).save(paths['image'], format="PNG")
+    print(f"{chart_type}/{technique}: added {added} sketches, {len(added_sketches)} in total")
+    return added
+
+
+def update_heatmaps(table_path=pilot_table, backgrounds=None, heatmap_dir=heatmap_dir):
+    """
+    Updates the heatmap of every chart type and technique with the sketches listed in the pipeline artifact.
+    Returns the number of sketches added.
+    """
+    backgrounds = background_charts if backgrounds is None else backgrounds
+    data = read_table(table_path, columns=['ResponseId', 'ChartType'] + techniques)
+    added = 0
+    for chart_type, chart_backgrounds in backgrounds.items():
+        rows = data[data["ChartType"].str.contains(chart_type, case=False, na=False)]
+        for technique, background in zip(techniques, chart_backgrounds):
+            with_sketch = rows[rows[technique].notna()]
+            sketches = dict(zip(with_sketch['ResponseId'], with_sketch[technique]))
+            try:
+                added += update_heatmap(chart_type, technique, sketches, background, heatmap_dir)
+            except Exception as e:
+                print(f"Skipping {chart_type}/{technique}: {e}")
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build per chart type density maps of where participants drew.")
+    parser.add_argument("--table", default=pilot_table, help="Artifact with the actual/analogy sketch paths")
+    parser.add_argument("--output-dir", default=heatmap_dir, help="Folder for the heatmaps")
+    args = parser.parse_args()
+
+    update_heatmaps(args.table, heatmap_dir=args.output_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+from urllib.parse import unquote, urlparse
+
+import requests
+from PIL import Image
+
+# Chart backgrounds live in the repo under analogyCharts/<type>/, the URLs below are the
+# GitHub copies of the same files
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+local_charts_dir = os.path.join(os.path.dirname(analysis_dir), 'analogyCharts')
+
+# Downloaded backgrounds are stored by the sha256 of their content, index.json maps URL -> hash
+cache_dir = os.path.join(analysis_dir, '.cache', 'backgrounds')
+
+#charts for tasks:
+background_charts = {
+    "stackedArea": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/stackedArea/actual.png", "https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/stackedArea/StackedArea.png"],
+    "waterfall": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/waterfall/actualTask.png", "https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/waterfall/WaterfallTask.png"],
+    "butterfly": ["https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/butterfly/actualTask.png?raw=true","https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/butterfly/ButterflyTask.png?raw=true"],
+    "bubble": ["https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/bubble/Scatter.png?raw=true", "https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/bubble/actual.png"],
+    "histogram": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/histogram/actual.png", "https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/histogram/histogram.png"],
+    "bar": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/bar/actualTask.png","https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/bar/Bar_Graph_Analogy_Task%202.png"],
+    "heatmap": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/heatmap/actual.png", "https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/heatmap/heatmap.png?raw=true"],
+    "sunburst": ["https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/sunburst/ActualTask.png?raw=true","https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/sunburst/SunburstTask.png?raw=true"]
+}
+
+
+def local_background_path(url):
+    """
+    Returns the analogyCharts/<type>/<file> copy of a background URL, or None if it is not in the repo.
+    """
+    # e.g. /oliphant0803/AnalogyVis/blob/main/analogyCharts/bar/Bar_Graph_Analogy_Task%202.png
+    path = unquote(urlparse(url).path)
+    if 'analogyCharts/' not in path:
+        return None
+    relative_path = path.split('analogyCharts/', 1)[1]
+    local_path = os.path.join(local_charts_dir, *relative_path.split('/'))
+    return local_path if os.path.isfile(local_path) else None
+
+
+def _load_cache_index():
+    index_path = os.path.join(cache_dir, 'index.json')
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path, mode='r', encoding='utf-8') as index_file:
+        return json.load(index_file)
+
+
+def _save_cache_index(index):
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, 'index.json')
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, mode='w', encoding='utf-8') as index_file:
+        json.dump(index, index_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, index_path)
+
+
+def cached_background_path(url):
+    """
+    Returns the on-disk cache copy of a background URL, downloading it only on a cache miss.
+    """
+    index = _load_cache_index()
+    digest = index.get(url)
+    if digest:
+        blob_path = os.path.join(cache_dir, f"{digest}.png")
+        if os.path.exists(blob_path):
+            return blob_path
+
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    digest = hashlib.sha256(response.content).hexdigest()
+
+    # Identical images fetched through different URLs share one blob
+    os.makedirs(cache_dir, exist_ok=True)
+    blob_path = os.path.join(cache_dir, f"{digest}.png")
+    if not os.path.exists(blob_path):
+        tmp_path = blob_path + '.tmp'
+        with open(tmp_path, mode='wb') as blob_file:
+            blob_file.write(response.content)
+        os.replace(tmp_path, blob_path)
+
+    index[url] = digest
+    _save_cache_index(index)
+    return blob_path
+
+
+@lru_cache(maxsize=None)
+def resolve_background(url):
+    """
+    Resolves a background URL to a local file: the repo copy first, then the download cache.
+    A path to an existing file is returned unchanged.
+    """
+    if os.path.isfile(url):
+        return url
+    return local_background_path(url) or cached_background_path(url)
+
+
+@lru_cache(maxsize=None)
+def load_background(url):
+    """
+    Returns the decoded RGBA background for a URL.
+    The result is shared between callers, so it must not be modified in place.
+    """
+    with Image.open(resolve_background(url)) as chart:
+        return chart.convert("RGBA")
+
+
+def resolve_backgrounds(charts=None):
+    """
+    Resolves every background once up front, returns {chart_type: [actual_path, analogy_path]}.
+    A background that is neither in the repo nor downloadable is None, so only its technique is skipped.
+    """
+    charts = background_charts if charts is None else charts
+    resolved = {}
+    for chart_type, urls in charts.items():
+        resolved[chart_type] = []
+        for url in urls:
+            try:
+                resolved[chart_type].append(resolve_background(url))
+            except Exception as e:
+                print(f"Background not available for {chart_type}: {url} ({e})")
+                resolved[chart_type].append(None)
+    return resolved
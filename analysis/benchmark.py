@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import synthetic
+
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(analysis_dir)
+
+
+def timed(results, stage, params, function, rows=None, images=None):
+    """
+    Runs function once, appends its wall time to results and returns what it returned.
+    rows/images are the counts processed, or callables computing them from the return value.
+    """
+    start = time.perf_counter()
+    value = function()
+    seconds = time.perf_counter() - start
+    results.append({
+        **params,
+        'stage': stage,
+        'seconds': round(seconds, 6),
+        'rows': rows(value) if callable(rows) else rows,
+        'images': images(value) if callable(images) else images,
+    })
+    print(f"{stage:<18} {params} {seconds:8.3f} s")
+    return value
+
+
+def run_size(work_dir, participants, timer_blocks, sketch_size, workers=None):
+    """
+    Generates a synthetic study of one size in work_dir and times every stage on it. Returns the result records.
+    """
+    from getNewTable import build_rows
+    from overlay_images import run_overlays
+    from pipeline import run_pipeline
+    from qualtrics import load_export
+    from timers import parse_timer_columns
+    from vark import score_vark
+    sys.path.insert(0, root_dir)
+    from massVis import group_counts
+
+    params = {'participants': participants, 'timer_blocks': timer_blocks, 'sketch_size': list(sketch_size)}
+    export_path = os.path.join(work_dir, 'export.csv')
+    sketches_dir = os.path.join(work_dir, 'sketches')
+    table_path = os.path.join(work_dir, 'table.feather')
+    state_path = os.path.join(work_dir, 'state.sqlite')
+    metadata_path = os.path.join(work_dir, 'massvis.csv')
+
+    results = []
+    respondents = timed(results, 'generate', params,
+                        lambda: synthetic.write_export(export_path, participants, timer_blocks), rows=len)
+    timed(results, 'generate_sketches', params,
+          lambda: synthetic.write_sketches(sketches_dir, respondents, sketch_size), images=lambda written: written)
+    backgrounds = synthetic.write_backgrounds(os.path.join(work_dir, 'backgrounds'), sketch_size)
+    synthetic.write_massvis_metadata(metadata_path, participants * 10)
+
+    data = timed(results, 'load_export', params, lambda: load_export(export_path, use_cache=False), rows=len)
+    timer_sets = parse_timer_columns(data.columns)
+    timed(results, 'timers', params, lambda: build_rows(data, timer_sets), rows=len)
+    timed(results, 'vark', params, lambda: score_vark(data), rows=len)
+    timed(results, 'extract', params,
+          lambda: run_pipeline(export_path, sketches_dir, table_path, full=True, state_path=state_path), rows=len)
+    overlay_dir = os.path.join(work_dir, 'annotations')
+    for stage in ('overlay', 'overlay_rerun'):
+        timed(results, stage, params,
+              lambda: run_overlays(table_path, overlay_dir, workers, backgrounds, state_path=state_path),
+              images=lambda processed: processed)
+    timed(results, 'massvis', params, lambda: group_counts(metadata_path, by=('source', 'type'), use_cache=False),
+          rows=participants * 10)
+    return results
+
+
+def parse_size(size):
+    """
+    Parses a WIDTHxHEIGHT sketch size, e.g. 800x600.
+    """
+    try:
+        width, height = (int(value) for value in size.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {size!r}")
+    return width, height
+
+
+def compare(results, baseline):
+    """
+    Prints the time of every stage relative to the same stage and size in an earlier report.
+    """
+    def key(record):
+        return record['stage'], record['participants'], record['timer_blocks'], tuple(record['sketch_size'])
+
+    before = {key(record): record['seconds'] for record in baseline['results']}
+    for record in results:
+        previous = before.get(key(record))
+        if previous:
+            print(f"{record['stage']:<18} {record['participants']:>6} participants: "
+                  f"{previous:.3f} s -> {record['seconds']:.3f} s ({record['seconds'] / previous:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the analysis stages on synthetic exports of several sizes.")
+    parser.add_argument("--participants", type=int, nargs='+', default=[50, 200, 1000], help="Study sizes to run")
+    parser.add_argument("--timer-blocks", type=int, nargs='+', default=[4], help="Timer blocks per export")
+    parser.add_argument("--sketch-size", type=parse_size, nargs='+', default=[(800, 600)], metavar='WIDTHxHEIGHT',
+                        help="Sketch and background sizes to run")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--output", default='benchmark.json', help="JSON report")
+    parser.add_argument("--compare", default=None, help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    # Read the earlier report first, it may be the file this run overwrites
+    baseline = None
+    if args.compare:
+        with open(args.compare, mode='r', encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = []
+    for participants in args.participants:
+        for timer_blocks in args.timer_blocks:
+            for sketch_size in args.sketch_size:
+                with tempfile.TemporaryDirectory(prefix='analogyvis-bench-') as work_dir:
+                    results += run_size(work_dir, participants, timer_blocks, sketch_size, args.workers)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'workers': args.workers,
+        'results': results,
+    }
+    with open(args.output, mode='w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"Benchmark saved to: {args.output}")
+
+    if baseline is not None:
+        compare(results, baseline)
+
+
+if __name__ == '__main__':
+    main()
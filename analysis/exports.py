@@ -0,0 +1,27 @@
+import csv
+
+# Standard library only, so that filtering an export doesn't import pandas
+
+# Define the columns we want to extract
+required_columns = ['ResponseId', 'PROLIFIC_PID', 'ChartType']
+
+
+def read_export(input_file, columns=required_columns):
+    """
+    Streams the rows of a Qualtrics export, keeping only the given columns.
+    The two Qualtrics metadata rows (question text and ImportId) are skipped.
+    """
+    with open(input_file, mode='r', newline='', encoding='utf-8') as infile:
+        csv_reader = csv.reader(infile)
+        header = next(csv_reader)
+        positions = [(col, header.index(col)) for col in columns if col in header]
+        id_position = header.index('ResponseId') if 'ResponseId' in header else None
+
+        for values in csv_reader:
+            if id_position is not None and id_position < len(values):
+                response_id = values[id_position]
+                if response_id == 'Response ID' or response_id.startswith('{'):
+                    continue
+            row = {col: values[position] for col, position in positions if position < len(values)}
+            if row:
+                yield row
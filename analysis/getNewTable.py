@@ -1,152 +1,118 @@
+import argparse
+import os
+
+import numpy as np
 import pandas as pd
-import re
 
-def main():
-    # Read the original CSV data
-    data = pd.read_csv('76.csv')
-
-    # Get the list of all column names
-    cols = data.columns.tolist()
-
-    # Patterns to match 'Timer 1_First Click' to 'Timer 8_First Click' and corresponding 'Timer 1_Last Click' to 'Timer 8_Last Click'
-    pattern_first_click = re.compile(r'(?i)timer (\d+)[\s_]*_first click(?:\.(\d+))?$')
-    pattern_last_click = re.compile(r'(?i)timer (\d+)[\s_]*_last click(?:\.(\d+))?$')
-
-    # Initialize list to hold processed data
-    processed_rows = []
-
-    for index, row in data.iterrows():
-        participant_id = row['PROLIFIC_PID']
-        response_id = row['ResponseId']
-
-        # Collect all 'First Click' and 'Last Click' columns for the participant
-        first_click_cols = [col for col in cols if pattern_first_click.match(col)]
-        last_click_cols = [col for col in cols if pattern_last_click.match(col)]
-
-        # Group columns by their occurrence (suffix or lack thereof)
-        first_click_sets = {}
-        last_click_sets = {}
-
-        for col in first_click_cols:
-            match = pattern_first_click.match(col)
-            question_num = match.group(1)
-            suffix = match.group(2) or '0'
-            if suffix not in first_click_sets:
-                first_click_sets[suffix] = {}
-            first_click_sets[suffix][question_num] = col
-
-        for col in last_click_cols:
-            match = pattern_last_click.match(col)
-            question_num = match.group(1)
-            suffix = match.group(2) or '0'
-            if suffix not in last_click_sets:
-                last_click_sets[suffix] = {}
-            last_click_sets[suffix][question_num] = col
-            
-
-        # Identify the sets that have data for all questions from 1 to 8
-        sets_with_data = []
-        suffixes = sorted(first_click_sets.keys(), key=lambda x: int(x))
-        # print(participant_id, suffixes)
-        for suffix in suffixes:
-            fc_set = first_click_sets[suffix]
-            lc_set = last_click_sets.get(suffix, {})
-            has_all_data = True
-            time_spent = 0
-            for q in range(1, 9):
-                q_str = str(q)
-                fc_col = fc_set.get(q_str)
-                lc_col = lc_set.get(q_str)
-                if fc_col and lc_col:
-                    fc_value = row[fc_col]
-                    lc_value = row[lc_col]
-                    # print(fc_col, lc_col)
-                    if pd.notna(fc_value) and pd.notna(lc_value):
-                        try:
-                            time_spent += float(lc_value) - float(fc_value)
-                        except ValueError:
-                            # has_all_data = False
-                            break
-                    else:
-                        # has_all_data = False
-                        break
-                else:
-                    # has_all_data = False
-                    break
-            if has_all_data:
-                sets_with_data.append({
-                    'suffix': suffix,
-                    'time_spent': time_spent
-                })
-            # print(participant_id, sets_with_data)
-            count = 0
-            for data in sets_with_data:
-                if data['time_spent'] > 900:
-                    count += 1
-            if count == 2:
-                print(participant_id, sets_with_data)
-                break  # Only need the first two sets with data
-
-        if count < 2:
-            print(f"Participant {participant_id} does not have two complete sets. Skipping.")
-            continue
-
-        # Assign techniques and orders (first occurrence is 'analogy', second is 'baseline')
-        techniques = ['analogy', 'baseline']
-        if row['Group'] == '1':
-            orders = ['first', 'second']
-        elif row['Group'] == '2':
-            orders = ['second', 'first']
-
-        for i in range(2):
-            sets_with_nonzero_time_spent = [data for data in sets_with_data if data['time_spent'] != 0]
-            time_spent = sets_with_nonzero_time_spent[i]['time_spent']
-            technique = techniques[i]
-            order = orders[i]
-
-            # Calculate dominant VARK modality
-            vark_types = ['V', 'A', 'R', 'K']
-            vark_counts = {v: 0 for v in vark_types}
-            for j in range(1, 17):
-                vark_col = f'VARK {j}'
-                if vark_col in row and pd.notna(row[vark_col]):
-                    vark_values = str(row[vark_col]).split(',')
-                    for v in vark_values:
-                        v = v.strip()
-                        if v in vark_types:
-                            vark_counts[v] += 1
-            max_count = max(vark_counts.values())
-            dominant_varks = [v for v, count in vark_counts.items() if count == max_count]
-            dominant_vark = ''
-            for v in vark_types:
-                if v in dominant_varks:
-                    dominant_vark = v
-                    break
-
-            # Build the data entry
-            data_entry = {
-                'PROLIFIC_PID': participant_id,
-                'ResponseId': response_id,
-                'Order': order,
-                'Technique': technique,
-                'Time': time_spent,
-                'PerformanceScore': '',
-                'DescriptionScore': '',
-                'ChartDifficulties': '',
-                'VARK': dominant_vark
-            }
-            processed_rows.append(data_entry)
-
-    # Build the result DataFrame
-    result_df = pd.DataFrame(processed_rows)
+from qualtrics import load_export
+from state import changed_keys, load_results, open_state, row_fingerprints, save_results, state_db
+from timers import parse_timer_columns, select_two_sets, set_times
+from vark import score_vark, vark_columns
+
+result_columns = ['PROLIFIC_PID', 'ResponseId', 'Order', 'Technique', 'Time',
+                  'PerformanceScore', 'DescriptionScore', 'ChartDifficulties', 'VARK']
+
+# Part of every stored row's fingerprint, bump results_version when the rules of build_rows change (the timer
+# patterns and 900 s threshold in timers.py, the VARK policy) so rows computed under the old rules are redone
+results_version = 1
+
+def build_rows(data, timer_sets):
+    # Compute every set's time for all participants together
+    times = set_times(data, timer_sets)
+
+    # Keep participants with two sets over 900 s (first occurrence is 'analogy', second is 'baseline')
+    has_two, first_set, second_set = select_two_sets(times)
+    for participant_id in data.loc[~has_two, 'PROLIFIC_PID']:
+        print(f"Participant {participant_id} does not have two complete sets. Skipping.")
+
+    kept = data[has_two]
+    rows = np.flatnonzero(has_two)
+    group = kept['Group'].astype(str)
+    # Calculate dominant VARK modality for all kept participants at once
+    vark = score_vark(kept, policy='dominant').to_numpy()
+
+    techniques = {
+        'analogy': (times[rows, first_set[rows]], group.map({'1': 'first', '2': 'second'})),
+        'baseline': (times[rows, second_set[rows]], group.map({'1': 'second', '2': 'first'})),
+    }
+    technique_frames = []
+    for position, (technique, (time_spent, order)) in enumerate(techniques.items()):
+        technique_frames.append(pd.DataFrame({
+            'PROLIFIC_PID': kept['PROLIFIC_PID'].to_numpy(),
+            'ResponseId': kept['ResponseId'].to_numpy(),
+            'Order': order.to_numpy(),
+            'Technique': technique,
+            'Time': time_spent,
+            'PerformanceScore': '',
+            'DescriptionScore': '',
+            'ChartDifficulties': '',
+            'VARK': vark,
+            '_participant': np.arange(len(kept)),
+            '_position': position,
+        }))
+
+    # Interleave so every participant's analogy row is followed by their baseline row
+    result_df = pd.concat(technique_frames, ignore_index=True)
+    result_df = result_df.sort_values(['_participant', '_position'], kind='stable')
 
     # Reorder the columns
-    result_df = result_df[['PROLIFIC_PID', 'ResponseId', 'Order', 'Technique', 'Time',
-                           'PerformanceScore', 'DescriptionScore', 'ChartDifficulties', 'VARK']]
+    return result_df[result_columns]
+
+def build_table(input_file, output_file, full=False, sketch_scores=None, state_path=state_db):
+    """
+    Builds dataAnalysis.csv from a Qualtrics export, processing only new or changed responses unless full.
+    AutoSketchScore is filled from the sketch_scores CSV when it exists. Returns the table.
+    """
+    # Read the original CSV data, typed and without the Qualtrics metadata rows
+    data = load_export(input_file)
+
+    # Parse the timer column layout once
+    timer_sets = parse_timer_columns(data.columns)
+    timer_columns = [col for timer_set in timer_sets.values() for click in ('first', 'last')
+                     for col in timer_set[click].values()]
+
+    # Only responses that are new or whose inputs changed since the last run are processed
+    fingerprints = row_fingerprints(data, ['PROLIFIC_PID', 'Group'] + timer_columns + vark_columns)
+    fingerprints = {response_id: f"v{results_version}:{fingerprint}"
+                    for response_id, fingerprint in zip(data['ResponseId'], fingerprints)}
+    conn = open_state(state_path)
+    changed = set(fingerprints) if full else set(changed_keys(conn, 'timers', fingerprints))
+    print(f"{len(changed)} new or changed responses out of {len(fingerprints)}")
+
+    new_rows = build_rows(data[data['ResponseId'].isin(changed)], timer_sets)
+    results = {response_id: [] for response_id in changed}
+    for record in new_rows.to_dict(orient='records'):
+        results[record['ResponseId']].append(record)
+    save_results(conn, 'timers', [(response_id, fingerprints[response_id], records) for response_id, records in results.items()])
+
+    # Merge the new results with the stored ones, in the order of the export
+    stored = load_results(conn, 'timers', data['ResponseId'])
+    conn.close()
+    result_df = pd.DataFrame([record for response_id in data['ResponseId'] for record in stored.get(response_id, [])],
+                             columns=result_columns)
+
+    # Add the automatic sketch scores when they have been computed, PerformanceScore stays hand-graded
+    if sketch_scores and os.path.exists(sketch_scores):
+        from sketch_scores import fill_sketch_scores
+        result_df = fill_sketch_scores(result_df, pd.read_csv(sketch_scores))
 
     # Save to CSV
-    result_df.to_csv('dataAnalysis.csv', index=False)
-    print("dataAnalysis.csv has been created successfully.")
+    result_df.to_csv(output_file, index=False)
+    print(f"{output_file} has been created successfully.")
+    return result_df
+
+def main():
+    parser = argparse.ArgumentParser(description="Build dataAnalysis.csv from a Qualtrics export.")
+    parser.add_argument("--input", default='76.csv', help="Qualtrics export CSV")
+    parser.add_argument("--output", default='dataAnalysis.csv', help="Output CSV")
+    parser.add_argument("--full", action="store_true", help="Recompute every response instead of only new or changed ones")
+    # sketch_scores.py writes its scores next to this file
+    parser.add_argument("--sketch-scores", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sketchScores.csv'),
+                        help="Scores from sketch_scores.py, written to AutoSketchScore")
+    parser.add_argument("--state", default=state_db, help="State store of the earlier runs")
+    args = parser.parse_args()
+
+    build_table(args.input, args.output, full=args.full, sketch_scores=args.sketch_scores, state_path=args.state)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,25 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+# Standard library only, so that cheap scripts can import it without pulling in pandas or PIL
+
+
+def run_jobs(function, jobs, workers=None, chunksize=1):
+    """
+    Calls function(*job) for every job tuple, across a process pool unless workers is 1 or there is at most
+    one job. function must be defined at module level so the workers can import it.
+    Returns the results in the order of the jobs.
+    """
+    jobs = list(jobs)
+    if workers == 1 or len(jobs) <= 1:
+        return [function(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, *zip(*jobs), chunksize=chunksize))
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as infile:
+        for chunk in iter(lambda: infile.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
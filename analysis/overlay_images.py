@@ -1,103 +1,180 @@
+import argparse
+import json
 import os
+
 import pandas as pd
 from PIL import Image
-import requests
-from io import BytesIO
-
-chart_folder_mapping = {
-    'bar': ['BarActual', 'BarAnalogy'],
-    'heatmap': ['HeatmapActual', 'HeatmapAnalogy'],
-    'sunburst': ['Sunburst Draw', 'SunburstAnalogy'],
-    'histogram': ['HistogramActual', 'HistogramAnalogy'],
-    'bubble': ['BubbleActual', 'BubbleAnalogy'],
-    'waterfall': ['WaterfallActual', 'WaterfallAnalogy'],
-    'butterfly': ['ButterflyActual', 'ButterflyAnalogy'],
-    'stackedArea': ['StackedAreaBaseline', 'StackedAreaAnalogy']
-}
+
+from backgrounds import load_background, resolve_backgrounds
+from jobs import run_jobs
+from pipeline import pilot_table, read_table, write_table
+from state import changed_keys, delete_results, open_state, save_results, state_db
 
 # Overlay function
 def overlay_images(chart_background_url, annotation_image_path, output_image_path):
     """
     Overlays a transparent annotation image onto a chart background image.
-    
+
     Parameters:
-    chart_background_url (str): URL to the chart background image.
+    chart_background_url (str): URL to the chart background image (resolved through the local cache).
     annotation_image_path (str): File path to the transparent annotation image.
     output_image_path (str): File path to save the resulting composite image.
     """
     try:
-        # Load the chart background from URL
-        response = requests.get(chart_background_url)
-        chart = Image.open(BytesIO(response.content)).convert("RGBA")
-        
+        # Load the chart background, decoded once per run
+        chart = load_background(chart_background_url)
+
         # Load the annotation image
         annotation = Image.open(annotation_image_path).convert("RGBA")
-        
+
         # Resize the annotation image to match the chart's dimensions
         annotation = annotation.resize(chart.size, Image.Resampling.LANCZOS)
-        
+
         # Composite the annotation onto the chart
         composite = Image.alpha_composite(chart, annotation)
-        
+
         # Save the result
         composite.save(output_image_path, format="PNG")
         print(f"Saved composite image: {output_image_path}")
-        return output_image_path  # Return the path to store in CSV
+        return output_image_path  # Return the path to store in the table
     except Exception as e:
         print(f"An error occurred: {e}")
         return None  # Return None if overlay fails
 
 # Paths and data
-filtered_pilot_csv = "/Users/h2o/Documents/Projects/AnalogyVis/analysis/filtered_pilot.csv"
-output_dir = "/Users/h2o/Documents/Projects/AnalogyVis/analysis/annotations"
-#charts for tasks:
-background_charts = {
-    "stackedArea": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/stackedArea/actual.png", "https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/stackedArea/StackedArea.png"],
-    "waterfall": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/waterfall/actualTask.png", "https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/waterfall/WaterfallTask.png"],
-    "butterfly": ["https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/butterfly/actualTask.png?raw=true","https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/butterfly/ButterflyTask.png?raw=true"],
-    "bubble": ["https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/bubble/Scatter.png?raw=true", "https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/bubble/actual.png"],
-    "histogram": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/histogram/actual.png", "https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/histogram/histogram.png"],
-    "bar": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/bar/actualTask.png","https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/bar/Bar_Graph_Analogy_Task%202.png"],
-    "heatmap": ["https://raw.githubusercontent.com/oliphant0803/AnalogyVis/refs/heads/main/analogyCharts/heatmap/actual.png", "https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/heatmap/heatmap.png?raw=true"],
-    "sunburst": ["https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/sunburst/ActualTask.png?raw=true","https://github.com/oliphant0803/AnalogyVis/blob/main/analogyCharts/sunburst/SunburstTask.png?raw=true"]
-}
-
-# Read the filtered pilot CSV
-data = pd.read_csv(filtered_pilot_csv)
-
-# Add columns for overlay paths
-data["actualOverlay"] = None
-data["analogyOverlay"] = None
-
-# Process each chart type
-for chart_type, backgrounds in background_charts.items():
-    # Create output folder for the chart type
-    chart_output_dir = os.path.join(output_dir, chart_type)
-    os.makedirs(chart_output_dir, exist_ok=True)
-    
-    # Extract rows corresponding to the chart type
-    filtered_rows = data[data["ChartType"].str.contains(chart_type, case=False)]
-    
-    for index, row in filtered_rows.iterrows():
-        # Get the paths for actual and analogy images
-        actual_path = row["actual"]
-        analogy_path = row["analogy"]
-        
-        # Define output paths
-        actual_output = os.path.join(chart_output_dir, f"{os.path.basename(actual_path)}_actual_composite.png")
-        analogy_output = os.path.join(chart_output_dir, f"{os.path.basename(analogy_path)}_analogy_composite.png")
-        
-        # Apply the overlay function
-        print(f"Processing row {index} for chart type: {chart_type}")
-        actual_overlay_path = overlay_images(backgrounds[0], actual_path, actual_output)  # Actual chart
-        analogy_overlay_path = overlay_images(backgrounds[1], analogy_path, analogy_output)  # Analogy chart
-        
-        # Update the CSV with overlay paths
-        if actual_overlay_path:
-            data.at[index, "actualOverlay"] = actual_overlay_path
-        if analogy_overlay_path:
-            data.at[index, "analogyOverlay"] = analogy_overlay_path
-
-# Save the updated CSV
-data.to_csv(filtered_pilot_csv, index=False)
-print(f"Updated CSV saved at {filtered_pilot_csv}")
\ No newline at end of file
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+output_dir = os.path.join(analysis_dir, "annotations")
+
+# Overlay columns written back to the table, keyed by technique
+overlay_columns = {"actual": "actualOverlay", "analogy": "analogyOverlay"}
+
+# Part of every stored fingerprint, bump it when overlay_images changes so every composite is redone
+results_version = 1
+
+
+def overlay_fingerprint(inputs):
+    return f"v{results_version}:" + json.dumps(inputs, sort_keys=True)
+
+
+def composite_is_current(output_path, inputs):
+    """
+    A composite whose fingerprint is unchanged in the state store is current if it is newer than its inputs.
+    """
+    try:
+        output_mtime = os.path.getmtime(output_path)
+        return all(output_mtime > os.path.getmtime(path) for path in inputs.values())
+    except OSError:
+        return False
+
+
+def collect_jobs(data, output_dir, backgrounds=None):
+    """
+    Builds one compositing job per sketch.
+
+    Parameters:
+    data (DataFrame): Rows with ChartType and the actual/analogy sketch paths.
+    output_dir (str): Folder that gets one subfolder of composites per chart type.
+    backgrounds (dict): {chart_type: [actual_background, analogy_background]}, URLs or local paths.
+
+    Returns a list of (row index, technique, background path, annotation path, output path).
+    """
+    jobs = []
+    # Resolve every background once, a technique whose background can't be found is skipped on its own
+    for chart_type, background_paths in resolve_backgrounds(backgrounds).items():
+        # Create output folder for the chart type
+        chart_output_dir = os.path.join(output_dir, chart_type)
+        os.makedirs(chart_output_dir, exist_ok=True)
+
+        # Extract rows corresponding to the chart type
+        filtered_rows = data[data["ChartType"].str.contains(chart_type, case=False, na=False)]
+
+        for index, row in filtered_rows.iterrows():
+            for technique, background_path in zip(overlay_columns, background_paths):
+                annotation_path = row[technique]
+                if background_path is None or pd.isna(annotation_path) or not annotation_path:
+                    continue
+                output_path = os.path.join(chart_output_dir, f"{os.path.basename(annotation_path)}_{technique}_composite.png")
+                jobs.append((index, technique, background_path, annotation_path, output_path))
+    return jobs
+
+
+def run_overlays(table_path=pilot_table, output_dir=output_dir, workers=None, backgrounds=None, state_path=state_db):
+    """
+    Composites every sketch onto its background across a process pool.
+    Composites that are newer than their inputs and listed in the state store are skipped, and
+    only the overlay cells that changed are written back to the table.
+    Returns the number of composites processed in this run.
+    """
+    data = read_table(table_path)
+    os.makedirs(output_dir, exist_ok=True)
+    conn = open_state(state_path)
+
+    jobs = collect_jobs(data, output_dir, backgrounds)
+    fingerprints = {output_path: overlay_fingerprint({"chart": background_path, "annotation": annotation_path})
+                    for _, _, background_path, annotation_path, output_path in jobs}
+    changed = set(changed_keys(conn, 'overlay', fingerprints))
+
+    # Split the jobs into composites that are already current and ones that need work
+    results = {}
+    pending = []
+    for index, technique, background_path, annotation_path, output_path in jobs:
+        inputs = {"chart": background_path, "annotation": annotation_path}
+        if output_path not in changed and composite_is_current(output_path, inputs):
+            results[(index, technique)] = output_path
+        else:
+            pending.append((index, technique, inputs, output_path))
+    print(f"{len(jobs) - len(pending)} composites up to date, {len(pending)} to process")
+
+    work = [(inputs["chart"], inputs["annotation"], output_path) for _, _, inputs, output_path in pending]
+    # Each worker keeps its own decoded backgrounds
+    outputs = run_jobs(overlay_images, work, workers, chunksize=max(1, len(work) // 64))
+
+    for (index, technique, inputs, output_path), overlay_path in zip(pending, outputs):
+        results[(index, technique)] = overlay_path
+    save_results(conn, 'overlay', [(output_path, fingerprints[output_path], inputs)
+                                   for (_, _, inputs, output_path), overlay_path in zip(pending, outputs) if overlay_path])
+    delete_results(conn, 'overlay', [output_path for (_, _, _, output_path), overlay_path in zip(pending, outputs) if not overlay_path])
+    conn.close()
+
+    # Only touch the overlay cells whose value changed
+    changes = {}
+    for column in overlay_columns.values():
+        current = data[column] if column in data.columns else pd.Series(None, index=data.index, dtype=object)
+        for (index, technique), overlay_path in results.items():
+            if overlay_columns[technique] != column:
+                continue
+            old_value = current.at[index]
+            old_value = None if pd.isna(old_value) else old_value
+            if old_value != overlay_path:
+                changes[(index, column)] = overlay_path
+
+    if not changes and all(column in data.columns for column in overlay_columns.values()):
+        print(f"No overlay changes, {table_path} left as is")
+        return len(work)
+
+    # Re-read right before writing so columns edited by other steps in the meantime are kept
+    data = read_table(table_path)
+    for column in overlay_columns.values():
+        if column not in data.columns:
+            data[column] = None
+        data[column] = data[column].astype(object)
+    for (index, column), overlay_path in changes.items():
+        data.at[index, column] = overlay_path
+
+    write_table(data, table_path)
+    print(f"Updated {len(changes)} overlay cells in {table_path}")
+    return len(work)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overlay participant sketches onto the chart backgrounds.")
+    parser.add_argument("--table", default=pilot_table, help="Artifact with the actual/analogy sketch paths")
+    parser.add_argument("--output-dir", default=output_dir, help="Folder for the composites")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    run_overlays(args.table, args.output_dir, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
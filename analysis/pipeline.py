@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import re
+from urllib.parse import unquote
+
+import pandas as pd
+
+from exports import read_export, required_columns
+from state import changed_keys, load_results, open_state, save_results, state_db
+
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Single artifact shared by every later step (overlay_images.py, ...)
+pilot_table = os.path.join(analysis_dir, 'filtered_pilot.feather')
+
+# Part of every stored fingerprint, bump it when the sketch lookup rules change so stored paths are looked up again
+results_version = 1
+
+# Define the chart type to folder mapping (chart type keywords)
+chart_folder_mapping = {
+    'bar': ['BarActual', 'BarAnalogy'],
+    'heatmap': ['HeatmapActual', 'HeatmapAnalogy'],
+    'sunburst': ['Sunburst Draw', 'SunburstAnalogy'],
+    'histogram': ['HistogramActual', 'HistogramAnalogy'],
+    'bubble': ['BubbleActual', 'BubbleAnalogy'],
+    'waterfall': ['WaterfallActual', 'WaterfallAnalogy'],
+    'butterfly': ['ButterflyActual', 'ButterflyAnalogy'],
+    'stackedArea': ['StackedAreaBaseline', 'StackedAreaAnalogy']
+}
+
+
+# Normalize function to make comparison case-insensitive and ignore non-alphabet characters
+def normalize_string(s):
+    # Remove non-alphabet characters and convert to lowercase
+    return re.sub(r'[^a-zA-Z]', '', s).lower()
+
+# Folder names are also URL-decoded first, so e.g. 'WaterfallAnalogy%C2%A0' matches 'WaterfallAnalogy'
+def normalize_folder(folder):
+    return normalize_string(unquote(folder))
+
+# Scan every sketch folder once and index the sketches by normalized folder name and ResponseId
+def build_sketch_index(sketches_dir):
+    sketch_index = {}
+    if not os.path.isdir(sketches_dir):
+        return sketch_index
+    with os.scandir(sketches_dir) as entries:
+        # Sorted so that e.g. 'WaterfallAnalogy' comes before 'WaterfallAnalogy%C2%A0'
+        folders = sorted((entry for entry in entries if entry.is_dir()), key=lambda entry: entry.name)
+    for folder in folders:
+        folder_index = sketch_index.setdefault(normalize_folder(folder.name), {})
+        with os.scandir(folder.path) as sketches:
+            for sketch in sketches:
+                if sketch.name.endswith('_signature.png') and sketch.is_file():
+                    # Folders that normalize to the same name are merged, the first one found wins
+                    folder_index.setdefault(sketch.name[:-len('_signature.png')], sketch.path)
+    return sketch_index
+
+
+def chart_folders(chart_type):
+    """
+    Returns the (actual, analogy) sketch folders for a ChartType value, or (None, None).
+    """
+    normalized_chart_type = normalize_string(chart_type or '')
+    for keyword, folders in chart_folder_mapping.items():
+        if normalize_string(keyword) in normalized_chart_type:
+            return tuple(folders)
+    return None, None
+
+
+def resolve_sketches(rows, sketch_index, known=None):
+    """
+    Pipeline stage adding the 'actual' and 'analogy' sketch paths to every row.
+    Rows whose ResponseId is in known ({ResponseId: {'actual': path, 'analogy': path}}) reuse those paths.
+    """
+    known = known or {}
+    for row in rows:
+        if row.get('ResponseId') in known:
+            row.update(known[row['ResponseId']])
+            yield row
+            continue
+        actual_folder, analogy_folder = chart_folders(row.get('ChartType'))
+        response_id = row.get('ResponseId')
+        row['actual'] = sketch_index.get(normalize_folder(actual_folder), {}).get(response_id) if actual_folder else None
+        row['analogy'] = sketch_index.get(normalize_folder(analogy_folder), {}).get(response_id) if analogy_folder else None
+        yield row
+
+
+def add_overlay_columns(rows, previous=None):
+    """
+    Pipeline stage adding the overlay columns, filled in later by overlay_images.py.
+    Overlays from the previous artifact ({ResponseId: row}) are kept while the sketch paths are unchanged.
+    """
+    previous = previous or {}
+    for row in rows:
+        old_row = previous.get(row.get('ResponseId'))
+        for technique, column in (('actual', 'actualOverlay'), ('analogy', 'analogyOverlay')):
+            keep = old_row is not None and old_row.get(technique) == row.get(technique)
+            row.setdefault(column, old_row.get(column) if keep else None)
+        yield row
+
+
+def sketch_fingerprint(row, sketches_dir):
+    # The sketch paths only depend on the chart type, the sketch store and the lookup rules
+    return hashlib.sha1(json.dumps([results_version, row.get('ChartType'), sketches_dir]).encode('utf-8')).hexdigest()
+
+
+def read_table(path=pilot_table, columns=None):
+    return pd.read_feather(path, columns=columns)
+
+
+def write_table(data, path=pilot_table):
+    """
+    Writes the artifact atomically, so a reader never sees a half-written file.
+    """
+    tmp_path = path + '.tmp'
+    data.reset_index(drop=True).to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def run_pipeline(input_file, sketches_dir, output_file=pilot_table, full=False, state_path=state_db):
+    """
+    Reads a Qualtrics export once, resolves the sketch paths and writes the shared artifact.
+
+    Responses resolved in an earlier run are taken from the state store, so the sketch folders are only
+    scanned when there are new responses, or responses whose sketches were still missing.
+    Returns the resulting DataFrame.
+    """
+    rows = list(read_export(input_file))
+    fingerprints = {row['ResponseId']: sketch_fingerprint(row, sketches_dir) for row in rows}
+
+    conn = open_state(state_path)
+    known = {}
+    if not full:
+        changed = set(changed_keys(conn, 'sketches', fingerprints))
+        known = {response_id: paths for response_id, paths in load_results(conn, 'sketches', fingerprints).items()
+                 if response_id not in changed}
+    pending = [row['ResponseId'] for row in rows if row['ResponseId'] not in known]
+    print(f"{len(pending)} new or incomplete responses out of {len(rows)}")
+
+    sketch_index = build_sketch_index(sketches_dir) if pending else {}
+
+    previous = {}
+    if os.path.exists(output_file):
+        previous = {row['ResponseId']: row for row in read_table(output_file).to_dict(orient='records')}
+
+    rows = add_overlay_columns(resolve_sketches(rows, sketch_index, known), previous)
+    data = pd.DataFrame(list(rows), columns=required_columns + ['actual', 'analogy', 'actualOverlay', 'analogyOverlay'])
+    write_table(data, output_file)
+
+    # Only responses with both sketches are final, the others are looked up again next time
+    resolved = data[data['ResponseId'].isin(pending) & data['actual'].notna() & data['analogy'].notna()]
+    save_results(conn, 'sketches', [(response_id, fingerprints[response_id], {'actual': actual, 'analogy': analogy})
+                                    for response_id, actual, analogy in resolved[['ResponseId', 'actual', 'analogy']].itertuples(index=False)])
+    conn.close()
+    return data
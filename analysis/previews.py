@@ -0,0 +1,131 @@
+import argparse
+import json
+import math
+import os
+
+from PIL import Image
+
+from jobs import run_jobs
+from overlay_images import overlay_columns
+from pipeline import pilot_table, read_table
+
+# Preview levels written next to every composite, as downscale factors
+levels = [2, 4, 8]
+# Thumbnails per row of a contact sheet
+sheet_columns = 8
+
+
+def preview_paths(composite_path):
+    """
+    Returns {factor: path} of the previews of a composite, in a previews/ folder next to it.
+    """
+    folder, name = os.path.split(composite_path)
+    stem = name[:-len('.png')] if name.endswith('.png') else name
+    return {factor: os.path.join(folder, 'previews', f"{stem}_1-{factor}.png") for factor in levels}
+
+
+def previews_are_current(composite_path):
+    try:
+        composite_mtime = os.path.getmtime(composite_path)
+        return all(os.path.getmtime(path) > composite_mtime for path in preview_paths(composite_path).values())
+    except OSError:
+        return False
+
+
+def build_previews(composite_path):
+    """
+    Writes the pyramid of a composite, each level halving the previous one.
+    Returns True if the previews were (re)written, False if they were current or the composite is unreadable.
+    """
+    if previews_are_current(composite_path):
+        return False
+    paths = preview_paths(composite_path)
+    try:
+        os.makedirs(os.path.dirname(paths[levels[0]]), exist_ok=True)
+        with Image.open(composite_path) as composite:
+            level = composite.convert("RGBA")
+        for factor in levels:
+            level = level.resize((max(1, level.width // 2), max(1, level.height // 2)), Image.Resampling.LANCZOS)
+            level.save(paths[factor], format="PNG")
+    except OSError as e:
+        print(f"Skipping {composite_path}: {e}")
+        return False
+    return True
+
+
+def build_contact_sheet(composite_paths, sheet_path, columns=sheet_columns):
+    """
+    Tiles the smallest previews of the composites into one sheet, pasting one thumbnail at a time.
+    """
+    thumbnails = [preview_paths(path)[levels[-1]] for path in composite_paths]
+    thumbnails = [path for path in thumbnails if os.path.exists(path)]
+    if not thumbnails:
+        return None
+    with Image.open(thumbnails[0]) as first:
+        tile_width, tile_height = first.size
+    rows = math.ceil(len(thumbnails) / columns)
+    sheet = Image.new("RGBA", (tile_width * min(columns, len(thumbnails)), tile_height * rows), (255, 255, 255, 255))
+    for i, thumbnail_path in enumerate(thumbnails):
+        with Image.open(thumbnail_path) as thumbnail:
+            tile = thumbnail.convert("RGBA")
+            if tile.size != (tile_width, tile_height):
+                tile = tile.resize((tile_width, tile_height), Image.Resampling.LANCZOS)
+            sheet.paste(tile, ((i % columns) * tile_width, (i // columns) * tile_height))
+    sheet.save(sheet_path, format="PNG")
+
+    # Remember which composites are on the sheet, in order
+    with open(sheet_path[:-len('.png')] + '.json', mode='w', encoding='utf-8') as index_file:
+        json.dump(composite_paths, index_file, indent=2)
+    return sheet_path
+
+
+def sheet_is_current(composite_paths, sheet_path):
+    index_path = sheet_path[:-len('.png')] + '.json'
+    if not (os.path.exists(sheet_path) and os.path.exists(index_path)):
+        return False
+    with open(index_path, mode='r', encoding='utf-8') as index_file:
+        return json.load(index_file) == composite_paths
+
+
+def build_all_previews(table_path=pilot_table, workers=None):
+    """
+    Builds the preview pyramid of every composite listed in the pipeline artifact on a process pool, then one
+    contact sheet per chart type and technique. Unchanged composites and sheets are skipped.
+    Returns the number of composites whose previews were written.
+    """
+    data = read_table(table_path, columns=list(overlay_columns.values()))
+    composites = {}
+    for technique, column in overlay_columns.items():
+        for composite_path in data[column].dropna():
+            if os.path.exists(composite_path):
+                # Composites are written to annotations/<chart type>/
+                chart_dir = os.path.dirname(composite_path)
+                composites.setdefault((chart_dir, technique), []).append(composite_path)
+
+    all_paths = [path for paths in composites.values() for path in paths]
+    written = run_jobs(build_previews, [(path,) for path in all_paths], workers,
+                       chunksize=max(1, len(all_paths) // 64))
+    rewritten = {path for path, was_written in zip(all_paths, written) if was_written}
+    print(f"Previews written for {len(rewritten)} of {len(all_paths)} composites")
+
+    for (chart_dir, technique), paths in composites.items():
+        paths = sorted(paths)
+        sheet_path = os.path.join(chart_dir, 'previews', f"contact_{technique}.png")
+        if sheet_is_current(paths, sheet_path) and not rewritten.intersection(paths):
+            continue
+        if build_contact_sheet(paths, sheet_path):
+            print(f"Saved contact sheet: {sheet_path}")
+    return len(rewritten)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write downsampled previews and contact sheets of the composites.")
+    parser.add_argument("--table", default=pilot_table, help="Artifact with the actualOverlay/analogyOverlay paths")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    build_all_previews(args.table, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
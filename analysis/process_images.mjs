@@ -12,46 +12,36 @@ const processCsv = async () => {
   // Define the preset columns you want to extract
   const presetColumns = ['ResponseId', 'PROLIFIC_PID', 'ChartType'];
 
-  // Read the CSV file
+  // Read the CSV file once: the first row is the header, the next two rows are Qualtrics metadata
   fs.createReadStream(inputFile)
-    .pipe(parse({ headers: true, maxRows: 1 })) // Skip the first 3 rows, and read only the first row (header)
-    .on('data', (row) => {
-      // Extract the header from the first row
-      const headers = Object.keys(row);
+    .pipe(parse({ headers: true, skipRows: 2 }))
+    .on('headers', (headers) => {
       console.log('Extracted Headers:', headers); // Optional: Log the extracted headers
     })
-    .on('end', () => {
-      // After extracting the headers, now process the rest of the CSV to filter for the required columns
-      fs.createReadStream(inputFile)
-        .pipe(parse({ headers: true, skipLines: 3 })) // Skip the first 3 rows and use the 4th row as header
-        .on('data', (row) => {
-          // Extract the required columns based on the preset columns
-          const filteredRow = {};
-          presetColumns.forEach((column) => {
-            if (row[column]) {
-              filteredRow[column] = row[column];
-            }
-          });
-          if (Object.keys(filteredRow).length > 0) {
-            rows.push(filteredRow);
-          }
-        })
-        .on('end', async () => {
-          if (rows.length > 0) {
-            // Convert the rows into a new CSV file
-            const csv = new ObjectsToCsv(rows);
-            await csv.toDisk(outputFile);
-            console.log('Filtered CSV has been saved to:', outputFile);
-          } else {
-            console.log('No rows were extracted. Please check the CSV content.');
-          }
-        })
-        .on('error', (error) => {
-          console.error('Error reading CSV:', error);
-        });
+    .on('data', (row) => {
+      // Extract the required columns based on the preset columns
+      const filteredRow = {};
+      presetColumns.forEach((column) => {
+        if (row[column]) {
+          filteredRow[column] = row[column];
+        }
+      });
+      if (Object.keys(filteredRow).length > 0) {
+        rows.push(filteredRow);
+      }
+    })
+    .on('end', async () => {
+      if (rows.length > 0) {
+        // Convert the rows into a new CSV file
+        const csv = new ObjectsToCsv(rows);
+        await csv.toDisk(outputFile);
+        console.log('Filtered CSV has been saved to:', outputFile);
+      } else {
+        console.log('No rows were extracted. Please check the CSV content.');
+      }
     })
     .on('error', (error) => {
-      console.error('Error reading CSV header:', error);
+      console.error('Error reading CSV:', error);
     });
 };
 
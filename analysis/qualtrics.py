@@ -0,0 +1,62 @@
+import os
+
+import pandas as pd
+
+from jobs import file_hash
+from timers import pattern_first_click, pattern_last_click
+
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Parsed exports are cached by the sha256 of the source CSV, bump cache_version when the parsing rules change
+cache_dir = os.path.join(analysis_dir, '.cache', 'qualtrics')
+cache_version = 2
+
+numeric_columns = ['Age', 'Duration (in seconds)', 'Progress']
+datetime_columns = ['StartDate', 'EndDate', 'RecordedDate']
+
+
+def parse_export(path):
+    """
+    Parses a Qualtrics export CSV into a typed DataFrame.
+
+    The first row is the header; the question text and ImportId rows that follow it are dropped.
+    The timers become floats, Age/Duration numbers and the dates datetimes. Every other column, including
+    ChartType and Group, stays a string so the notebooks' value_counts/groupby output is unchanged.
+    """
+    data = pd.read_csv(path, dtype=str)
+
+    # Drop the two Qualtrics metadata rows
+    if 'ResponseId' in data.columns:
+        response_ids = data['ResponseId'].fillna('')
+        data = data[(response_ids != 'Response ID') & ~response_ids.str.startswith('{')]
+    data = data.reset_index(drop=True)
+
+    timer_columns = [col for col in data.columns if pattern_first_click.match(col) or pattern_last_click.match(col)]
+    for col in timer_columns + [col for col in numeric_columns if col in data.columns]:
+        data[col] = pd.to_numeric(data[col], errors='coerce')
+    for col in datetime_columns:
+        if col in data.columns:
+            data[col] = pd.to_datetime(data[col], errors='coerce')
+    return data
+
+
+def load_export(path, use_cache=True):
+    """
+    Loads a Qualtrics export, parsing it only the first time a given file content is seen.
+
+    The parsed frame is cached as an uncompressed Feather file keyed on the CSV's hash, so later loads
+    read the typed columns back instead of re-parsing the CSV.
+    """
+    if not use_cache:
+        return parse_export(path)
+
+    cache_path = os.path.join(cache_dir, f"{file_hash(path)}-v{cache_version}.feather")
+    if os.path.exists(cache_path):
+        return pd.read_feather(cache_path)
+
+    data = parse_export(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    data.to_feather(tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path)
+    return data
@@ -0,0 +1,317 @@
+import argparse
+import hashlib
+import json
+import os
+
+import plotly.graph_objects as go
+
+from jobs import run_jobs
+
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(analysis_dir)
+
+# Rendered stimuli go to stimuli/<chart dir>/<phase>.png, the hand-made backgrounds in analogyCharts/ are left alone
+stimuli_dir = os.path.join(analysis_dir, 'stimuli')
+
+# Bump when a renderer changes so every stimulus is rendered again
+renderer_version = 1
+
+# Outer size of every chart, in pixels, as in the chart's main.ts
+chart_sizes = {
+    'bar': (960, 500),
+    'boxplot': (1160, 700),
+    'butterfly': (960, 500),
+    'heatmap': (1160, 700),
+    'histogram': (960, 500),
+    'nightingale': (1160, 700),
+    'sankey': (960, 600),
+    'scatter': (1160, 700),
+    'stackedArea': (1360, 700),
+    'stepedLine': (1160, 700),
+    'sunburst': (1160, 700),
+    'surplusDefict': (1160, 700),
+    'treemap': (960, 600),
+    'waterfall': (1260, 700),
+}
+
+phases = ['phase1', 'phase2']
+
+
+def record_keys(data):
+    # Keys of the records in their order in the JSON, e.g. ['Building Name', 'Height (meters)']
+    return list(data[0].keys())
+
+
+def render_bar(data):
+    label, value = record_keys(data)[:2]
+    fig = go.Figure(go.Bar(x=[d[label] for d in data], y=[d[value] for d in data], marker_color='steelblue'))
+    fig.update_layout(xaxis_title=label, yaxis_title=value)
+    return fig
+
+
+def render_histogram(data):
+    # The bins are already counted, so the bars only need to touch
+    fig = render_bar(data)
+    fig.update_layout(bargap=0)
+    return fig
+
+
+def render_boxplot(data):
+    fig = go.Figure([go.Box(y=values, name=name, boxpoints='outliers') for name, values in data.items()])
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+def render_butterfly(data):
+    # Depth below the surface to the left, length above it to the right, one row per nail
+    nails = [f"Nail {d['nailID']}" for d in data]
+    fig = go.Figure([
+        go.Bar(y=nails, x=[-d['depthBelowSurface'] for d in data], orientation='h', name='Depth below surface',
+               customdata=[d['depthBelowSurface'] for d in data], hovertemplate='%{customdata}'),
+        go.Bar(y=nails, x=[d['lengthAboveSurface'] for d in data], orientation='h', name='Length above surface'),
+    ])
+    fig.update_layout(barmode='relative', yaxis_autorange='reversed')
+    return fig
+
+
+def render_heatmap(data):
+    if 'columns' in data[0]:
+        # Grid of zones: one row per grid letter, coloured by temperature from blue through white to red
+        cells = [cell for row in data for cell in row['columns']]
+        grids = sorted({cell['grid'] for cell in cells})
+        columns = sorted({cell['column'] for cell in cells})
+        values = {(cell['grid'], cell['column']): cell['zoneTemperature'] for cell in cells}
+        fig = go.Figure(go.Heatmap(z=[[values.get((grid, column)) for column in columns] for grid in grids],
+                                   x=[str(column) for column in columns], y=grids, zmin=-24, zmax=60,
+                                   colorscale=[[0, '#33ccff'], [0.5, 'white'], [1, 'red']],
+                                   xgap=1, ygap=1))
+        fig.update_layout(xaxis_side='top', yaxis_autorange='reversed')
+        return fig
+
+    # Records of (row, column, value)
+    row_key, column_key, value_key = record_keys(data)[:3]
+    rows = list(dict.fromkeys(d[row_key] for d in data))
+    columns = list(dict.fromkeys(d[column_key] for d in data))
+    values = {(d[row_key], d[column_key]): d[value_key] for d in data}
+    fig = go.Figure(go.Heatmap(z=[[values.get((row, column)) for column in columns] for row in rows],
+                               x=columns, y=rows, colorscale='Blues', xgap=1, ygap=1))
+    fig.update_layout(yaxis_autorange='reversed')
+    return fig
+
+
+def render_nightingale(data):
+    label, *causes = record_keys(data)
+    fig = go.Figure([go.Barpolar(r=[d[cause] for d in data], theta=[d[label] for d in data], name=cause)
+                     for cause in causes])
+    fig.update_layout(polar_angularaxis_direction='clockwise')
+    return fig
+
+
+def render_sankey(data):
+    names = [node['name'] for node in data['nodes']]
+    index = {name: i for i, name in enumerate(names)}
+    links = data['links']
+    fig = go.Figure(go.Sankey(
+        node={'label': names, 'pad': 15, 'thickness': 15},
+        link={'source': [index[link['source']] for link in links],
+              'target': [index[link['target']] for link in links],
+              'value': [link['value'] for link in links]},
+    ))
+    return fig
+
+
+def render_scatter(data):
+    x_key, y_key, size_key = record_keys(data)[:3]
+    sizes = [d[size_key] for d in data]
+    fig = go.Figure(go.Scatter(
+        x=[d[x_key] for d in data], y=[d[y_key] for d in data], mode='markers+text',
+        marker={'size': sizes, 'sizemode': 'area', 'sizeref': 2 * max(sizes) / 40 ** 2, 'color': 'steelblue'},
+        text=[d.get('note', '') for d in data], textposition='top center',
+    ))
+    fig.update_layout(xaxis_title=x_key, yaxis_title=y_key)
+    return fig
+
+
+def render_stacked_area(data):
+    x_key = record_keys(data)[0]
+    layers = [key for key in record_keys(data)[1:] if isinstance(data[0][key], (int, float))]
+    fig = go.Figure([go.Scatter(x=[d[x_key] for d in data], y=[d[layer] for d in data], name=layer,
+                                mode='lines', stackgroup='layers') for layer in layers])
+    fig.update_layout(xaxis_title=x_key)
+    return fig
+
+
+def render_stepped_line(data):
+    x_key, *series = record_keys(data)
+    fig = go.Figure([go.Scatter(x=[d[x_key] for d in data], y=[d[name] for d in data], name=name,
+                                mode='lines', line_shape='hv') for name in series])
+    fig.update_layout(xaxis_title=x_key)
+    return fig
+
+
+def render_surplus_deficit(data):
+    x_key, y_key = record_keys(data)[:2]
+    x = [d[x_key] for d in data]
+    y = [d[y_key] for d in data]
+    fig = go.Figure([
+        go.Scatter(x=x, y=[max(value, 0) for value in y], fill='tozeroy', mode='none',
+                   fillcolor='rgba(44, 160, 44, 0.5)', name='Surplus'),
+        go.Scatter(x=x, y=[min(value, 0) for value in y], fill='tozeroy', mode='none',
+                   fillcolor='rgba(214, 39, 40, 0.5)', name='Deficit'),
+        go.Scatter(x=x, y=y, mode='lines', line_color='black', showlegend=False),
+    ])
+    fig.update_layout(xaxis_title=x_key, yaxis_title=y_key)
+    return fig
+
+
+def render_waterfall(data):
+    fig = go.Figure(go.Waterfall(x=[d['Event'] for d in data], y=[d['Effect'] for d in data],
+                                 measure=['relative'] * len(data)))
+    return fig
+
+
+def flatten_hierarchy(node, parent_id, ids, labels, parents, values):
+    """
+    Flattens a {name, children | value} tree into the ids/labels/parents/values lists of plotly's hierarchical
+    charts. Internal nodes get the sum of their leaves. Returns the value of node.
+    """
+    node_id = f"{parent_id}/{node['name']}"
+    position = len(ids)
+    ids.append(node_id)
+    labels.append(node['name'])
+    parents.append(parent_id)
+    values.append(0)
+    total = node.get('value', 0)
+    for child in node.get('children', []):
+        total += flatten_hierarchy(child, node_id, ids, labels, parents, values)
+    values[position] = total
+    return total
+
+
+def hierarchy_lists(data):
+    ids, labels, parents, values = [], [], [], []
+    flatten_hierarchy(data, '', ids, labels, parents, values)
+    return {'ids': ids, 'labels': labels, 'parents': parents, 'values': values, 'branchvalues': 'total'}
+
+
+def render_sunburst(data):
+    return go.Figure(go.Sunburst(**hierarchy_lists(data)))
+
+
+def render_treemap(data):
+    return go.Figure(go.Treemap(**hierarchy_lists(data)))
+
+
+renderers = {
+    'bar': render_bar,
+    'boxplot': render_boxplot,
+    'butterfly': render_butterfly,
+    'heatmap': render_heatmap,
+    'histogram': render_histogram,
+    'nightingale': render_nightingale,
+    'sankey': render_sankey,
+    'scatter': render_scatter,
+    'stackedArea': render_stacked_area,
+    'stepedLine': render_stepped_line,
+    'sunburst': render_sunburst,
+    'surplusDefict': render_surplus_deficit,
+    'treemap': render_treemap,
+    'waterfall': render_waterfall,
+}
+
+
+def find_datasets(root_dir=root_dir, charts=None):
+    """
+    Returns (chart dir, phase, JSON path) for every phase dataset of the chart directories that have a renderer.
+    """
+    datasets = []
+    for chart_dir in sorted(charts or renderers):
+        for phase in phases:
+            path = os.path.join(root_dir, chart_dir, f"{phase}.json")
+            if os.path.exists(path):
+                datasets.append((chart_dir, phase, path))
+    return datasets
+
+
+def dataset_hash(chart_dir, path):
+    """
+    Hashes the parsed JSON (so formatting-only edits don't count), the output size and the renderer version.
+    """
+    with open(path, mode='r', encoding='utf-8') as json_file:
+        data = json.load(json_file)
+    content = json.dumps({'data': data, 'size': chart_sizes[chart_dir], 'version': renderer_version}, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def render_stimulus(chart_dir, json_path, output_path):
+    """
+    Renders one dataset to output_path. Returns None, or the error message if it couldn't be rendered.
+    """
+    try:
+        with open(json_path, mode='r', encoding='utf-8') as json_file:
+            data = json.load(json_file)
+        fig = renderers[chart_dir](data)
+        width, height = chart_sizes[chart_dir]
+        fig.update_layout(width=width, height=height, template='plotly_white',
+                          margin={'l': 60, 'r': 40, 't': 40, 'b': 60})
+        tmp_path = output_path[:-len('.png')] + '.tmp.png'
+        fig.write_image(tmp_path, format='png', width=width, height=height)
+        os.replace(tmp_path, output_path)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def render_all(root_dir=root_dir, output_dir=stimuli_dir, charts=None, workers=None, full=False):
+    """
+    Renders every phase dataset to output_dir/<chart dir>/<phase>.png on a process pool, skipping the datasets
+    whose content hash matches the manifest and whose PNG exists. Returns the number of stimuli rendered.
+    """
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    manifest = {}
+    if os.path.exists(manifest_path) and not full:
+        with open(manifest_path, mode='r', encoding='utf-8') as manifest_file:
+            manifest = json.load(manifest_file)
+
+    jobs, hashes = [], {}
+    for chart_dir, phase, json_path in find_datasets(root_dir, charts):
+        output_path = os.path.join(output_dir, chart_dir, f"{phase}.png")
+        key = f"{chart_dir}/{phase}"
+        hashes[key] = dataset_hash(chart_dir, json_path)
+        if manifest.get(key) == hashes[key] and os.path.exists(output_path):
+            continue
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        jobs.append((key, (chart_dir, json_path, output_path)))
+    print(f"{len(jobs)} of {len(hashes)} stimuli need rendering")
+
+    errors = run_jobs(render_stimulus, [job for _, job in jobs], workers)
+
+    rendered = 0
+    for (key, (_, _, output_path)), error in zip(jobs, errors):
+        if error is None:
+            manifest[key] = hashes[key]
+            rendered += 1
+            print(f"Saved stimulus: {output_path}")
+        else:
+            manifest.pop(key, None)
+            print(f"Failed to render {key}: {error}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(manifest_path, mode='w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return rendered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render every chart's phase1/phase2 dataset to a PNG stimulus.")
+    parser.add_argument("--output-dir", default=stimuli_dir, help="Folder for the rendered stimuli")
+    parser.add_argument("--charts", nargs='+', choices=sorted(renderers), help="Only render these chart directories")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--full", action="store_true", help="Render every dataset, even if unchanged")
+    args = parser.parse_args()
+
+    render_all(output_dir=args.output_dir, charts=args.charts, workers=args.workers, full=args.full)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy import ndimage
+
+from backgrounds import load_background, resolve_backgrounds
+from jobs import run_jobs
+from sketch_store import load_sketches, store_dir, techniques
+
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+scores_csv = os.path.join(analysis_dir, 'sketchScores.csv')
+
+# A background pixel is chart ink if any channel is more than this far from the paper, the most common colour
+ink_threshold = 30
+# Backgrounds with more ink than this have no paper to tell the chart apart from, their sketches aren't scored
+max_ink_fraction = 0.75
+# Key regions: the chart is split into grid x grid cells, the cells containing ink are the ones to cover
+grid = 8
+# Sketches are scored in blocks of this many, one block per job
+block_size = 32
+
+# dataAnalysis.csv technique for every sketch technique
+technique_rows = {'actual': 'baseline', 'analogy': 'analogy'}
+
+
+def paper_colour(chart):
+    """
+    Returns the most common RGB colour of the opaque pixels of a (height, width, 4) chart, its background.
+    """
+    rgb = chart[..., :3][chart[..., 3] > 0].astype(np.int32)
+    colours, counts = np.unique((rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2], return_counts=True)
+    colour = colours[counts.argmax()]
+    return np.array([colour >> 16, (colour >> 8) & 255, colour & 255], dtype=np.int16)
+
+
+@lru_cache(maxsize=None)
+def ground_truth(background):
+    """
+    Returns (ink mask, distance to the nearest ink pixel, key region cells) for a background URL or path,
+    or None if the ink covers more than max_ink_fraction of the chart.
+    """
+    chart = np.asarray(load_background(background), dtype=np.int16)
+    if not (chart[..., 3] > 0).any():
+        return None
+    ink = (np.abs(chart[..., :3] - paper_colour(chart)).max(axis=2) > ink_threshold) & (chart[..., 3] > 0)
+    if ink.mean() > max_ink_fraction:
+        return None
+    distance = ndimage.distance_transform_edt(~ink)
+    return ink, distance, grid_cells(ink[None])[0]
+
+
+def grid_cells(masks):
+    """
+    Marks the grid x grid cells that contain any True pixel, for a (n, height, width) block of masks.
+    """
+    n, height, width = masks.shape
+    cell_height, cell_width = height // grid, width // grid
+    cropped = masks[:, :cell_height * grid, :cell_width * grid]
+    return cropped.reshape(n, grid, cell_height, grid, cell_width).any(axis=(2, 4))
+
+
+def score_block(sketches, ink, distance, key_cells):
+    """
+    Scores a (n, height, width, 4) block of sketches against one chart, all sketches at once.
+
+    iou: overlap of the stroke mask with the chart ink.
+    chamfer: mean distance in pixels from a stroke pixel to the nearest chart ink (NaN for empty sketches).
+    coverage: share of the key regions the sketch touches.
+    score: mean of iou, coverage and a chamfer score that is 1 on the ink and 0.5 at 2% of the diagonal.
+    """
+    strokes = sketches[..., 3] > 0
+    stroke_pixels = strokes.sum(axis=(1, 2))
+
+    intersection = (strokes & ink).sum(axis=(1, 2))
+    union = (strokes | ink).sum(axis=(1, 2))
+    iou = intersection / np.maximum(union, 1)
+
+    # One sketch at a time, so only its stroke pixels' distances are gathered rather than an (n, height, width) block
+    distance_sums = np.array([distance[mask].sum() for mask in strokes])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        chamfer = distance_sums / stroke_pixels
+    scale = 0.02 * np.hypot(*ink.shape)
+    chamfer_score = np.where(stroke_pixels > 0, 1 / (1 + np.nan_to_num(chamfer) / scale), 0.0)
+
+    coverage = (grid_cells(strokes) & key_cells).sum(axis=(1, 2)) / max(key_cells.sum(), 1)
+
+    return {
+        'iou': iou,
+        'chamfer': chamfer,
+        'coverage': coverage,
+        'score': (iou + chamfer_score + coverage) / 3,
+    }
+
+
+def score_slice(chart_type, technique, background, start, stop, store_dir=store_dir):
+    """
+    Scores rows start to stop of the memory-mapped sketch store of a chart type and technique.
+    Every metric is NaN if the background has no usable ground truth.
+    """
+    truth = ground_truth(background)
+    if truth is None:
+        return {metric: np.full(stop - start, np.nan) for metric in ('iou', 'chamfer', 'coverage', 'score')}
+    sketches, _ = load_sketches(chart_type, technique, store_dir)
+    return score_block(np.asarray(sketches[start:stop]), *truth)
+
+
+def score_sketches(backgrounds=None, store_dir=store_dir, workers=None):
+    """
+    Scores every sketch in the sketch store against the chart it was drawn on.
+    The backgrounds are resolved to local files here, so the workers never download or touch the cache index.
+    Returns a DataFrame with ResponseId, ChartType, technique and the metrics of score_block.
+    """
+    jobs, stores = [], []
+    for chart_type, chart_backgrounds in resolve_backgrounds(backgrounds).items():
+        for technique, background in zip(techniques, chart_backgrounds):
+            if background is None:
+                continue
+            try:
+                sketches, index = load_sketches(chart_type, technique, store_dir)
+            except FileNotFoundError:
+                print(f"No sketch store for {chart_type}/{technique}, run sketch_store.py first")
+                continue
+            if ground_truth(background) is None:
+                print(f"{chart_type}/{technique}: more than {max_ink_fraction:.0%} of {background} is ink, "
+                      f"its sketches are left unscored")
+            stores.append((chart_type, technique, index))
+            jobs += [(chart_type, technique, background, start, min(start + block_size, len(sketches)), store_dir)
+                     for start in range(0, len(sketches), block_size)]
+
+    results = run_jobs(score_slice, jobs, workers)
+
+    frames = []
+    for (chart_type, technique, _, start, _, _), metrics in zip(jobs, results):
+        frame = pd.DataFrame(metrics)
+        frame.insert(0, 'technique', technique)
+        frame.insert(0, 'ChartType', chart_type)
+        frame.insert(0, '_row', np.arange(start, start + len(frame)))
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=['ResponseId', 'ChartType', 'technique', 'iou', 'chamfer', 'coverage', 'score'])
+
+    scores = pd.concat(frames, ignore_index=True)
+    response_ids = {(chart_type, technique, row): response_id
+                    for chart_type, technique, index in stores for response_id, row in index.items()}
+    scores.insert(0, 'ResponseId', [response_ids.get(key)
+                                    for key in scores[['ChartType', 'technique', '_row']].itertuples(index=False, name=None)])
+    # Rows of sketches that couldn't be decoded have no ResponseId
+    return scores.dropna(subset=['ResponseId']).drop(columns='_row').reset_index(drop=True)
+
+
+def fill_sketch_scores(result_df, scores, column='AutoSketchScore'):
+    """
+    Fills column of a dataAnalysis.csv frame with the sketch score of the matching ResponseId and technique
+    (the actual sketch belongs to the 'baseline' row). Rows without a scored sketch keep their value.
+    The scores go in their own column, next to the hand-graded PerformanceScore rather than over it.
+    """
+    if column not in result_df.columns:
+        result_df[column] = np.nan
+    lookup = {(response_id, technique_rows[technique]): score
+              for response_id, technique, score in scores[['ResponseId', 'technique', 'score']].itertuples(index=False)}
+    keys = list(zip(result_df['ResponseId'], result_df['Technique']))
+    filled = pd.Series([lookup.get(key) for key in keys], index=result_df.index, dtype=object)
+    result_df[column] = filled.where(filled.notna(), result_df[column])
+    return result_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every stored sketch against its ground-truth chart.")
+    parser.add_argument("--store-dir", default=store_dir, help="Sketch store built by sketch_store.py")
+    parser.add_argument("--output", default=scores_csv, help="Output CSV")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    scores = score_sketches(store_dir=args.store_dir, workers=args.workers)
+    scores.to_csv(args.output, index=False)
+    print(f"{len(scores)} sketch scores saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+from backgrounds import background_charts, load_background
+from jobs import run_jobs
+from pipeline import build_sketch_index, chart_folder_mapping, normalize_folder
+
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+
+# One (sketches, height, width, 4) uint8 array per chart type and technique, plus a ResponseId index
+store_dir = os.path.join(analysis_dir, '.cache', 'sketches')
+
+techniques = ['actual', 'analogy']
+
+
+def store_paths(chart_type, technique, store_dir=store_dir):
+    base = os.path.join(store_dir, f"{chart_type}_{technique}")
+    return base + '.npy', base + '.json'
+
+
+def decode_into(array_path, start, sketch_paths, size):
+    """
+    Decodes a slice of the sketches straight into the memory-mapped array, from row start on.
+    A sketch that can't be read is left as an empty (zero) row. Returns the rows that failed.
+    """
+    block = np.load(array_path, mmap_mode='r+')
+    failed = []
+    for offset, sketch_path in enumerate(sketch_paths):
+        try:
+            with Image.open(sketch_path) as sketch:
+                block[start + offset] = np.asarray(sketch.convert("RGBA").resize(size, Image.Resampling.LANCZOS))
+        except OSError as e:
+            print(f"Skipping {sketch_path}: {e}")
+            block[start + offset] = 0
+            failed.append(start + offset)
+    block.flush()
+    return failed
+
+
+def store_is_current(array_path, index_path, response_ids, size, sketches):
+    """
+    The store is current if it holds the same ResponseIds at the same size and is newer than every sketch.
+    """
+    if not (os.path.exists(array_path) and os.path.exists(index_path)):
+        return False
+    with open(index_path, mode='r', encoding='utf-8') as index_file:
+        index = json.load(index_file)
+    if index['ids'] != response_ids or tuple(index['size']) != tuple(size):
+        return False
+    array_mtime = os.path.getmtime(array_path)
+    return all(os.path.getmtime(sketches[response_id]) < array_mtime for response_id in response_ids)
+
+
+def build_technique_store(chart_type, technique, sketches, size, store_dir=store_dir, workers=None):
+    """
+    Decodes the sketches ({ResponseId: path}) of one chart type and technique, resized to size (width, height),
+    into a memory-mapped .npy file. Sketches that can't be read are empty rows, listed as 'failed' in the index.
+    Returns the number of sketches decoded (0 if the store was current).
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    array_path, index_path = store_paths(chart_type, technique, store_dir)
+    response_ids = sorted(sketches)
+    if store_is_current(array_path, index_path, response_ids, size, sketches):
+        print(f"{chart_type}/{technique}: {len(response_ids)} sketches up to date")
+        return 0
+
+    width, height = size
+    tmp_path = array_path[:-len('.npy')] + '.tmp.npy'
+    block = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=(len(response_ids), height, width, 4))
+    del block
+
+    # Split the sketches into contiguous slices, one decode job per slice
+    paths = [sketches[response_id] for response_id in response_ids]
+    chunk_size = max(1, -(-len(paths) // (4 * (workers or os.cpu_count() or 1))))
+    jobs = [(tmp_path, start, paths[start:start + chunk_size], size) for start in range(0, len(paths), chunk_size)]
+    try:
+        failed = [response_ids[row] for rows in run_jobs(decode_into, jobs, workers) for row in rows]
+        os.replace(tmp_path, array_path)
+    except BaseException:
+        # Don't leave a half-decoded array behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    with open(index_path, mode='w', encoding='utf-8') as index_file:
+        json.dump({'size': [width, height], 'ids': response_ids, 'failed': failed}, index_file)
+    print(f"{chart_type}/{technique}: decoded {len(response_ids) - len(failed)} sketches into {array_path}"
+          + (f", {len(failed)} unreadable" if failed else ""))
+    return len(response_ids) - len(failed)
+
+
+def build_store(sketches_dir, backgrounds=None, store_dir=store_dir, workers=None):
+    """
+    Builds the sketch store for every chart type in chart_folder_mapping, each sketch normalized to the size
+    of the background it was drawn on. Returns the number of sketches decoded.
+    """
+    backgrounds = background_charts if backgrounds is None else backgrounds
+    sketch_index = build_sketch_index(sketches_dir)
+    decoded = 0
+    for chart_type, folders in chart_folder_mapping.items():
+        if chart_type not in backgrounds:
+            continue
+        for technique, folder, background in zip(techniques, folders, backgrounds[chart_type]):
+            try:
+                size = load_background(background).size
+            except Exception as e:
+                print(f"Skipping {chart_type}/{technique}, background not available: {e}")
+                continue
+            sketches = sketch_index.get(normalize_folder(folder), {})
+            decoded += build_technique_store(chart_type, technique, sketches, size, store_dir, workers)
+    return decoded
+
+
+def load_sketches(chart_type, technique, store_dir=store_dir):
+    """
+    Returns (sketches, index): the read-only memory-mapped (n, height, width, 4) uint8 array of a chart type
+    and technique, and {ResponseId: row} into it. Sketches that couldn't be decoded are not in the index.
+    """
+    array_path, index_path = store_paths(chart_type, technique, store_dir)
+    with open(index_path, mode='r', encoding='utf-8') as index_file:
+        index = json.load(index_file)
+    failed = set(index.get('failed', []))
+    return np.load(array_path, mmap_mode='r'), {response_id: i for i, response_id in enumerate(index['ids'])
+                                                 if response_id not in failed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode every sketch once into per chart type memory-mapped arrays.")
+    parser.add_argument("--sketches-dir", required=True, help="Folder with one subfolder of sketches per task")
+    parser.add_argument("--store-dir", default=store_dir, help="Where the .npy arrays and their indexes go")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    build_store(args.sketches_dir, store_dir=args.store_dir, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Results of every processing step, keyed on (stage, ResponseId) so each wave only processes new responses
+state_db = os.path.join(analysis_dir, '.cache', 'state.sqlite')
+
+
+def open_state(path=state_db):
+    """
+    Opens (and creates if needed) the local state store.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS results (
+            stage TEXT NOT NULL,
+            key TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            result TEXT,
+            updated REAL NOT NULL,
+            PRIMARY KEY (stage, key)
+        )
+    """)
+    return conn
+
+
+def row_fingerprints(data, columns):
+    """
+    Hashes the given columns of every row at once, returns a Series of fingerprint strings.
+    A response whose fingerprint changed has to be processed again.
+    """
+    present = [col for col in columns if col in data.columns]
+    return pd.util.hash_pandas_object(data[present].astype(str), index=False).astype(str)
+
+
+def changed_keys(conn, stage, fingerprints):
+    """
+    Returns the keys of {key: fingerprint} that are new or whose fingerprint changed since the last run.
+    """
+    stored = dict(conn.execute("SELECT key, fingerprint FROM results WHERE stage = ?", (stage,)))
+    return [key for key, fingerprint in fingerprints.items() if stored.get(key) != fingerprint]
+
+
+def save_results(conn, stage, records):
+    """
+    Stores (key, fingerprint, result) records, result being anything JSON serializable.
+    """
+    now = time.time()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO results (stage, key, fingerprint, result, updated) VALUES (?, ?, ?, ?, ?)",
+            [(stage, key, fingerprint, json.dumps(result, default=str), now) for key, fingerprint, result in records])
+
+
+def load_results(conn, stage, keys=None):
+    """
+    Returns {key: result} for a stage, limited to keys if given.
+    """
+    rows = conn.execute("SELECT key, result FROM results WHERE stage = ?", (stage,))
+    results = {key: json.loads(result) for key, result in rows}
+    if keys is None:
+        return results
+    return {key: results[key] for key in keys if key in results}
+
+
+def delete_results(conn, stage, keys):
+    with conn:
+        conn.executemany("DELETE FROM results WHERE stage = ? AND key = ?", [(stage, key) for key in keys])
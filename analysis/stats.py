@@ -0,0 +1,135 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from jobs import run_jobs
+
+analysis_dir = os.path.dirname(os.path.abspath(__file__))
+stats_csv = os.path.join(analysis_dir, 'statsResults.csv')
+
+group_columns = ['ChartType', 'Order', 'VARK']
+
+# Resamples per job, so a single large cell is also spread over the workers
+block_resamples = 2000
+
+
+def paired_values(data, value='Time'):
+    """
+    Returns one row per participant with their analogy and baseline value, the difference (analogy - baseline)
+    and the ChartType/Order/VARK groups. Order is the position of the analogy task ('first' or 'second').
+    Participants without both techniques are dropped.
+    """
+    data = data.assign(**{value: pd.to_numeric(data[value], errors='coerce')})
+    values = data.pivot_table(index='ResponseId', columns='Technique', values=value, aggfunc='first')
+    values = values.reindex(columns=['analogy', 'baseline']).dropna()
+
+    analogy_rows = data[data['Technique'] == 'analogy'].drop_duplicates('ResponseId').set_index('ResponseId')
+    groups = analogy_rows[[column for column in group_columns if column in analogy_rows.columns]]
+    paired = values.join(groups, how='left')
+    paired['difference'] = paired['analogy'] - paired['baseline']
+    return paired.reset_index()
+
+
+def resample_block(differences, resamples, seed):
+    """
+    Draws resamples bootstrap means and sign-flip permutation means of the paired differences at once, from
+    (resamples, n) index and sign matrices. Returns (bootstrap means, permutation means).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(differences)
+    indices = rng.integers(0, n, size=(resamples, n))
+    bootstrap = differences[indices].mean(axis=1)
+    signs = rng.integers(0, 2, size=(resamples, n), dtype=np.int8) * 2 - 1
+    permutation = (signs * differences).mean(axis=1)
+    return bootstrap, permutation
+
+
+def summarize_cell(differences, bootstrap, permutation, confidence=0.95):
+    observed = differences.mean()
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(bootstrap, [alpha, 1 - alpha])
+    # Two-sided, counting the observed statistic as one of the permutations
+    p_value = (np.sum(np.abs(permutation) >= abs(observed)) + 1) / (len(permutation) + 1)
+    return {'mean_difference': observed, 'ci_low': low, 'ci_high': high, 'p_value': p_value}
+
+
+def paired_statistics(data, value='Time', by=group_columns, resamples=10000, confidence=0.95, seed=0,
+                      workers=None):
+    """
+    Bootstrap confidence intervals of the mean analogy - baseline difference and paired sign-flip permutation
+    p-values, for every combination of the by columns (overall if by is empty).
+    Every block of resamples gets its own child of SeedSequence(seed), so results don't depend on the workers.
+    Returns one row per cell.
+    """
+    paired = paired_values(data, value)
+    by = [column for column in by if column in paired.columns]
+    cells = paired.groupby(by, dropna=False) if by else [((), paired)]
+
+    jobs, summaries, cell_differences = [], {}, {}
+    for cell, rows in cells:
+        cell = cell if isinstance(cell, tuple) else (cell,)
+        summaries[cell] = {
+            **dict(zip(by, cell)),
+            'n': len(rows),
+            'mean_analogy': rows['analogy'].mean(),
+            'mean_baseline': rows['baseline'].mean(),
+        }
+        if len(rows) < 2:
+            continue
+        differences = cell_differences[cell] = rows['difference'].to_numpy(dtype=np.float64)
+        for start in range(0, resamples, block_resamples):
+            jobs.append((cell, differences, min(block_resamples, resamples - start)))
+
+    seeds = np.random.SeedSequence(seed).spawn(len(jobs))
+    results = run_jobs(resample_block, [(differences, count, child)
+                                        for (_, differences, count), child in zip(jobs, seeds)], workers)
+
+    blocks = {}
+    for (cell, _, _), (bootstrap, permutation) in zip(jobs, results):
+        blocks.setdefault(cell, ([], []))
+        blocks[cell][0].append(bootstrap)
+        blocks[cell][1].append(permutation)
+    for cell, (bootstrap, permutation) in blocks.items():
+        summaries[cell].update(summarize_cell(cell_differences[cell], np.concatenate(bootstrap),
+                                              np.concatenate(permutation), confidence))
+
+    columns = by + ['n', 'mean_analogy', 'mean_baseline', 'mean_difference', 'ci_low', 'ci_high', 'p_value']
+    return pd.DataFrame(list(summaries.values())).reindex(columns=columns)
+
+
+def add_chart_types(data, export_file):
+    """
+    dataAnalysis.csv has no ChartType, take it from the Qualtrics export by ResponseId.
+    """
+    from qualtrics import load_export
+    export = load_export(export_file)[['ResponseId', 'ChartType']].drop_duplicates('ResponseId')
+    return data.drop(columns='ChartType', errors='ignore').merge(export, on='ResponseId', how='left')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bootstrap CIs and paired permutation tests of analogy vs baseline.")
+    parser.add_argument("--input", default='dataAnalysis.csv', help="Table from getNewTable.py")
+    parser.add_argument("--export", default=None, help="Qualtrics export to take ChartType from")
+    parser.add_argument("--value", default='Time', help="Column to compare, e.g. Time or PerformanceScore")
+    parser.add_argument("--by", nargs='*', default=group_columns, choices=group_columns, help="Columns to split by")
+    parser.add_argument("--resamples", type=int, default=10000, help="Bootstrap and permutation resamples per cell")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the intervals")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the resampling")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--output", default=stats_csv, help="Output CSV")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.input, dtype={'ResponseId': str})
+    if args.export:
+        data = add_chart_types(data, args.export)
+
+    results = paired_statistics(data, args.value, args.by, args.resamples, args.confidence, args.seed, args.workers)
+    results.to_csv(args.output, index=False)
+    print(results.to_string(index=False))
+    print(f"Statistics saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from pipeline import chart_folder_mapping
+from timers import questions
+from vark import vark_columns, vark_types
+
+metadata_columns = ['StartDate', 'EndDate', 'Progress', 'Duration (in seconds)', 'RecordedDate',
+                    'ResponseId', 'PROLIFIC_PID', 'Age', 'Group', 'ChartType']
+
+massvis_columns = ['filename', 'source', 'category', 'type', 'url', 'comments']
+
+
+def timer_columns(timer_blocks):
+    """
+    Qualtrics timer columns for timer_blocks repeated blocks: 'Timer n_First Click', then '.1', '.2', ... suffixes.
+    """
+    columns = []
+    for block in range(timer_blocks):
+        suffix = f".{block}" if block else ''
+        for question in questions:
+            columns += [f"Timer {question}_First Click{suffix}", f"Timer {question}_Last Click{suffix}"]
+    return columns
+
+
+def export_rows(participants, timer_blocks=4, seed=0):
+    """
+    Returns (header, rows) of a synthetic export. Every participant does two random timer blocks that take
+    over 900 s in total, with a chart type from chart_folder_mapping and 16 VARK answers of one to two types.
+    """
+    rng = np.random.default_rng(seed)
+    header = metadata_columns + timer_columns(timer_blocks) + vark_columns
+    chart_types = list(chart_folder_mapping)
+    rows = []
+    for i in range(participants):
+        timers = [''] * (2 * len(questions) * timer_blocks)
+        for block in rng.choice(timer_blocks, size=min(2, timer_blocks), replace=False):
+            first = rng.uniform(5, 30, size=len(questions))
+            spent = rng.uniform(120, 240, size=len(questions))
+            for q in range(len(questions)):
+                position = 2 * (block * len(questions) + q)
+                timers[position:position + 2] = [f"{first[q]:.3f}", f"{first[q] + spent[q]:.3f}"]
+        answers = [','.join(rng.choice(vark_types, size=rng.integers(1, 3), replace=False)) for _ in vark_columns]
+        rows.append(['2024-11-20 10:00:00', '2024-11-20 10:40:00', '100', str(rng.integers(1500, 3000)),
+                     '2024-11-20 10:40:01', f"R_{i:07d}", f"P{i:07d}", str(rng.integers(18, 65)),
+                     str(rng.integers(1, 3)), chart_types[i % len(chart_types)]]
+                    + timers + answers)
+    return header, rows
+
+
+def write_export(path, participants, timer_blocks=4, seed=0):
+    """
+    Writes a Qualtrics-shaped export CSV, including the question text and ImportId rows after the header.
+    Returns the ResponseIds and chart types of the participants.
+    """
+    header, rows = export_rows(participants, timer_blocks, seed)
+    with open(path, mode='w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        writer.writerow(['Response ID' if col == 'ResponseId' else col for col in header])
+        writer.writerow([f'{{"ImportId":"{col}"}}' for col in header])
+        writer.writerows(rows)
+    response_id, chart_type = header.index('ResponseId'), header.index('ChartType')
+    return [(row[response_id], row[chart_type]) for row in rows]
+
+
+def draw_sketch(path, size, rng, strokes=6):
+    # Transparent image with a few random polyline strokes, like a signature-pad export
+    sketch = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sketch)
+    width, height = size
+    for _ in range(strokes):
+        points = [(int(x), int(y)) for x, y in zip(rng.integers(0, width, 5), rng.integers(0, height, 5))]
+        draw.line(points, fill=(0, 0, 0, 255), width=3)
+    sketch.save(path, format="PNG")
+
+
+def write_sketches(sketches_dir, participants, size=(800, 600), seed=0):
+    """
+    Writes an actual and an analogy sketch for every (ResponseId, ChartType) into the chart_folder_mapping
+    folders, as <ResponseId>_signature.png. Returns the number of sketches written.
+    """
+    rng = np.random.default_rng(seed)
+    written = 0
+    for response_id, chart_type in participants:
+        for folder in chart_folder_mapping[chart_type]:
+            os.makedirs(os.path.join(sketches_dir, folder), exist_ok=True)
+            draw_sketch(os.path.join(sketches_dir, folder, f"{response_id}_signature.png"), size, rng)
+            written += 1
+    return written
+
+
+def write_backgrounds(backgrounds_dir, size=(800, 600)):
+    """
+    Writes a plain chart-like background per chart type and technique, standing in for the GitHub URLs.
+    Returns a {chart type: [actual path, analogy path]} dict for the backgrounds= parameters.
+    """
+    os.makedirs(backgrounds_dir, exist_ok=True)
+    width, height = size
+    backgrounds = {}
+    for chart_type in chart_folder_mapping:
+        paths = []
+        for technique in ('actual', 'analogy'):
+            chart = Image.new("RGBA", size, (255, 255, 255, 255))
+            draw = ImageDraw.Draw(chart)
+            axes = [(width // 10, height // 10), (width // 10, height * 9 // 10), (width * 9 // 10, height * 9 // 10)]
+            draw.line(axes, fill=(0, 0, 0, 255), width=2)
+            for bar in range(1, 6):
+                left = width // 10 + bar * width // 7
+                draw.rectangle([left, height // 2 - bar * height // 20, left + width // 14, height * 9 // 10],
+                               fill=(70, 130, 180, 255))
+            path = os.path.join(backgrounds_dir, f"{chart_type}_{technique}.png")
+            chart.save(path, format="PNG")
+            paths.append(path)
+        backgrounds[chart_type] = paths
+    return backgrounds
+
+
+def write_massvis_metadata(path, charts, seed=0):
+    """
+    Writes a MassVis-shaped metadata CSV with classic Mac '\\r' line endings, like single2k_metadata.csv.
+    """
+    rng = np.random.default_rng(seed)
+    sources = ['Economist Daily', 'Nature', 'Visual.ly', 'Wall Street Journal', 'World Health Organization']
+    categories = ['G', 'I', 'N', 'S']
+    types = ['Area', 'Bars', 'Circles', 'Diagrams', 'Lines', 'Maps', 'Points', 'Table']
+    with open(path, mode='w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile, lineterminator='\r')
+        writer.writerow(massvis_columns)
+        for i in range(charts):
+            writer.writerow([f"chart_{i}.png", rng.choice(sources), rng.choice(categories), rng.choice(types),
+                             f"http://example.com/chart_{i}.png", ''])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic Qualtrics export with matching sketches.")
+    parser.add_argument("--output-dir", required=True, help="Folder for the export, sketches and backgrounds")
+    parser.add_argument("--participants", type=int, default=100, help="Number of participants")
+    parser.add_argument("--timer-blocks", type=int, default=4, help="Repeated Timer n_First/Last Click blocks")
+    parser.add_argument("--sketch-size", type=int, nargs=2, default=[800, 600], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    participants = write_export(os.path.join(args.output_dir, 'export.csv'), args.participants, args.timer_blocks,
+                                args.seed)
+    written = write_sketches(os.path.join(args.output_dir, 'sketches'), participants, tuple(args.sketch_size),
+                             args.seed)
+    write_backgrounds(os.path.join(args.output_dir, 'backgrounds'), tuple(args.sketch_size))
+    print(f"Wrote {len(participants)} responses and {written} sketches to: {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Patterns to match 'Timer 1_First Click' to 'Timer 8_First Click' and corresponding 'Timer 1_Last Click' to 'Timer 8_Last Click'
+# Qualtrics adds a '.k' suffix to the k-th repeat of the same timer block
+pattern_first_click = re.compile(r'(?i)timer (\d+)[\s_]*_first click(?:\.(\d+))?$')
+pattern_last_click = re.compile(r'(?i)timer (\d+)[\s_]*_last click(?:\.(\d+))?$')
+
+# Every chart task has 8 timed questions
+questions = range(1, 9)
+
+
+def parse_timer_columns(columns):
+    """
+    Groups the timer columns of an export by their repeat suffix, once per column layout.
+
+    Returns {suffix: {'first': {question: column}, 'last': {question: column}}} ordered by suffix,
+    with suffix '0' for the block without a '.k' suffix. Only suffixes with first click columns are kept.
+    """
+    timer_sets = {}
+    for col in columns:
+        for click, pattern in (('first', pattern_first_click), ('last', pattern_last_click)):
+            match = pattern.match(col)
+            if match:
+                question_num = int(match.group(1))
+                suffix = match.group(2) or '0'
+                timer_sets.setdefault(suffix, {'first': {}, 'last': {}})[click][question_num] = col
+    return {suffix: timer_sets[suffix]
+            for suffix in sorted(timer_sets, key=int) if timer_sets[suffix]['first']}
+
+
+def set_times(data, timer_sets):
+    """
+    Computes the time spent on every timer set for all participants at once.
+
+    For each set the (Last Click - First Click) differences are summed over questions 1 to 8, stopping at
+    the first question with a missing column or a missing/non-numeric value.
+
+    Returns an array of shape (participants, sets).
+    """
+    timer_columns = [col for timer_set in timer_sets.values() for click in ('first', 'last')
+                     for col in timer_set[click].values()]
+    column_position = {col: i for i, col in enumerate(timer_columns)}
+
+    # One numeric block for all timer columns, plus a trailing NaN column for missing questions
+    values = data[timer_columns].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    values = np.hstack([values, np.full((len(data), 1), np.nan)])
+    missing = len(timer_columns)
+
+    first_idx = np.array([[column_position.get(timer_set['first'].get(q), missing) for q in questions]
+                          for timer_set in timer_sets.values()], dtype=int).reshape(len(timer_sets), len(questions))
+    last_idx = np.array([[column_position.get(timer_set['last'].get(q), missing) for q in questions]
+                         for timer_set in timer_sets.values()], dtype=int).reshape(len(timer_sets), len(questions))
+
+    # (participants, sets, questions)
+    diffs = values[:, last_idx] - values[:, first_idx]
+
+    # A question only counts if every question before it in the set had data
+    valid = np.cumprod(~np.isnan(diffs), axis=2).astype(bool)
+    return np.where(valid, diffs, 0.0).sum(axis=2)
+
+
+def select_two_sets(times, threshold=900):
+    """
+    Picks the analogy and baseline set for every participant.
+
+    Sets are scanned in order until two of them took longer than threshold seconds; among the sets scanned
+    so far, the first two with a non-zero time are used.
+
+    Returns (has_two, first_set, second_set): a boolean mask of participants with two such sets and the
+    column indices of their first and second set in times.
+    """
+    n_sets = times.shape[1]
+    if n_sets == 0:
+        empty = np.zeros(len(times), dtype=int)
+        return np.zeros(len(times), dtype=bool), empty, empty
+
+    reached = np.cumsum(times > threshold, axis=1) >= 2
+    has_two = reached.any(axis=1)
+    stop = np.argmax(reached, axis=1)
+
+    scanned = np.arange(n_sets)[None, :] <= stop[:, None]
+    nonzero = scanned & (times != 0)
+    rank = np.cumsum(nonzero, axis=1)
+    first_set = np.argmax(nonzero & (rank == 1), axis=1)
+    second_set = np.argmax(nonzero & (rank == 2), axis=1)
+    return has_two, first_set, second_set
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# Define the VARK types and the 16 questionnaire columns
+vark_types = ['V', 'A', 'R', 'K']
+vark_columns = [f'VARK {i}' for i in range(1, 17)]
+
+
+def vark_counts(data, columns=vark_columns):
+    """
+    Counts the V/A/R/K answers of every participant in one columnar pass.
+
+    Each VARK column holds comma-separated answers (e.g. "V,K"); answers are stripped and upper-cased,
+    anything that is not a VARK type is ignored.
+
+    Returns a participants x [V, A, R, K] DataFrame of counts with the index of data.
+    """
+    present = [col for col in columns if col in data.columns]
+
+    # Flatten all answers into one Series labelled with the participant's position
+    answers = pd.Series(data[present].to_numpy(dtype=object).ravel(),
+                        index=np.repeat(np.arange(len(data)), len(present)))
+    answers = answers.dropna().astype(str).str.split(',').explode().str.strip().str.upper()
+    answers = answers[answers.isin(vark_types)]
+
+    counts = (answers.groupby([answers.index, answers.to_numpy()]).size()
+              .unstack(fill_value=0)
+              .reindex(index=range(len(data)), columns=vark_types, fill_value=0))
+    counts.index = data.index
+    return counts
+
+
+def dominant_vark(counts):
+    """
+    Most frequent type per participant, ties broken in V, A, R, K order.
+    """
+    return counts[vark_types].idxmax(axis=1)
+
+
+def multimodal_vark(counts, threshold=10):
+    """
+    Every type chosen at least threshold times, concatenated in alphabetical order (e.g. "AK").
+    Participants without such a type get their dominant type instead.
+    """
+    reached = counts[vark_types] >= threshold
+    multimodal = pd.Series('', index=counts.index, dtype=object)
+    for v in sorted(vark_types):
+        multimodal = multimodal + np.where(reached[v], v, '')
+    return multimodal.where(reached.any(axis=1), dominant_vark(counts))
+
+
+def score_vark(data, policy='dominant', threshold=10):
+    """
+    Scores the VARK preference of every participant in data.
+
+    Parameters:
+    data (DataFrame): Export with the 'VARK 1'..'VARK 16' columns.
+    policy (str): 'dominant' for the single most frequent type, 'multimodal' for every type reaching threshold.
+    threshold (int): Minimum count for a type to be part of a multimodal preference.
+    """
+    counts = vark_counts(data)
+    if policy == 'dominant':
+        return dominant_vark(counts)
+    if policy == 'multimodal':
+        return multimodal_vark(counts, threshold)
+    raise ValueError(f"Unknown VARK policy: {policy}")
@@ -1,36 +1,128 @@
+import argparse
+import json
+import os
+
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
+import shapely.wkb
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# State boundaries already projected into the map projection, so later runs need neither the network nor reprojection
+cache_dir = os.path.join(root_dir, '.cache', 'contour')
+
+projection = ccrs.LambertConformal()
+
+# Map extent (bounding box) as lon min, lon max, lat min, lat max
+extent = [-125, -66.5, 24, 49]
+
+def boundaries_path(scale='50m', cache_dir=cache_dir):
+    return os.path.join(cache_dir, f"states_{scale}_lambert.json")
+
+def precompute_boundaries(scale='50m', cache_dir=cache_dir):
+    """
+    Projects the Natural Earth state boundaries inside the extent into the map projection once and saves them
+    as WKB. Downloads the shapefiles if cartopy doesn't have them yet.
+    """
+    states = cfeature.STATES.with_scale(scale)
+    # Pad the extent a little so states crossing the edge of the map are kept whole
+    lon_min, lon_max, lat_min, lat_max = extent
+    geometries = [projection.project_geometry(geometry, states.crs)
+                  for geometry in states.intersecting_geometries([lon_min - 5, lon_max + 5, lat_min - 5, lat_max + 5])]
+    geometries = [geometry for geometry in geometries if not geometry.is_empty]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = boundaries_path(scale, cache_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, mode='w', encoding='utf-8') as cache_file:
+        json.dump({'projection': projection.proj4_init, 'extent': extent,
+                   'geometries': [geometry.wkb_hex for geometry in geometries]}, cache_file)
+    os.replace(tmp_path, path)
+    print(f"Saved {len(geometries)} projected state boundaries to: {path}")
+    return geometries
+
+def load_boundaries(scale='50m', cache_dir=cache_dir, offline=False):
+    """
+    Returns the projected state boundaries from the cache, precomputing them if the cache is missing or was made
+    for another projection or extent. With offline=True a missing cache is an error instead of a download.
+    """
+    path = boundaries_path(scale, cache_dir)
+    if os.path.exists(path):
+        with open(path, mode='r', encoding='utf-8') as cache_file:
+            cached = json.load(cache_file)
+        if cached['projection'] == projection.proj4_init and cached['extent'] == extent:
+            return [shapely.wkb.loads(geometry, hex=True) for geometry in cached['geometries']]
+    if offline:
+        raise FileNotFoundError(f"No projected boundaries at {path}, run with --precompute first")
+    return precompute_boundaries(scale, cache_dir)
+
+def sample_field(lon, lat):
+    # Sample function to generate contour data (e.g., some arbitrary elevation data)
+    return np.sin(3 * np.pi * lon / 180) * np.cos(2 * np.pi * lat / 180)
+
+def compute_field(lon, lat, chunk_rows=None, dtype=np.float64):
+    """
+    Evaluates sample_field on the grid of the 1-D lon and lat vectors by broadcasting a row of longitudes against
+    a column of latitudes, without building meshgrid copies. With chunk_rows, only that many latitude rows are
+    evaluated at a time, so the temporaries stay small on very dense grids.
+    Returns a (len(lat), len(lon)) array.
+    """
+    data = np.empty((len(lat), len(lon)), dtype=dtype)
+    step = chunk_rows or len(lat)
+    for start in range(0, len(lat), step):
+        data[start:start + step] = sample_field(lon[None, :], lat[start:start + step, None])
+    return data
+
+def plot_contours(boundaries, resolution=50, contour_levels=5, chunk_rows=None, output_file='contour.png'):
+    # Create a figure with a specific projection
+    fig = plt.figure(figsize=(10, 6))
+    ax = plt.axes(projection=projection)
+    ax.set_extent(extent, ccrs.Geodetic())
+
+    # Add state boundaries, already in the map projection
+    ax.add_geometries(boundaries, crs=projection, facecolor='none', edgecolor='black')
 
-# Create a figure with a specific projection
-fig = plt.figure(figsize=(10, 6))
-ax = plt.axes(projection=ccrs.LambertConformal())
+    lon = np.linspace(extent[0], extent[1], resolution)
+    lat = np.linspace(extent[2], extent[3], resolution)
+    data = compute_field(lon, lat, chunk_rows)
 
-# Set up the map extent (bounding box)
-ax.set_extent([-125, -66.5, 24, 49], ccrs.Geodetic())
+    # Plot contours
+    contours = ax.contour(lon, lat, data, contour_levels, colors='blue',
+                          transform=ccrs.PlateCarree())
 
-# Add state boundaries
-ax.add_feature(cfeature.STATES.with_scale('50m'), edgecolor='black')
+    # Add labels to contours
+    ax.clabel(contours, inline=True, fontsize=8)
 
-# Generate some sample data for contours
-lon = np.linspace(-125, -66.5, 50)
-lat = np.linspace(24, 49, 50)
-lon2d, lat2d = np.meshgrid(lon, lat)
+    # Add titles and labels if needed
+    ax.set_title('High-Level Contour Map of the United States')
 
-# Sample function to generate contour data (e.g., some arbitrary elevation data)
-data = np.sin(3 * np.pi * lon2d / 180) * np.cos(2 * np.pi * lat2d / 180)
+    fig.savefig(output_file)
+    plt.close(fig)
+    print(f"Saved contour map: {output_file}")
 
-# Plot contours
-contour_levels = 5  # number of contour lines
-contours = ax.contour(lon, lat, data, contour_levels, colors='blue',
-                      transform=ccrs.PlateCarree())
+def main():
+    parser = argparse.ArgumentParser(description="Draw contour maps of the United States.")
+    parser.add_argument("--resolution", type=int, nargs='+', default=[50], help="Grid points per axis, one map each")
+    parser.add_argument("--levels", type=int, default=5, help="Number of contour lines")
+    parser.add_argument("--chunk-rows", type=int, default=None, help="Evaluate the field this many rows at a time")
+    parser.add_argument("--output", default='contour_{resolution}.png', help="Output file, {resolution} is filled in")
+    parser.add_argument("--scale", default='50m', choices=['10m', '50m', '110m'], help="Natural Earth scale")
+    parser.add_argument("--precompute", action="store_true", help="Only (re)build the projected boundary cache")
+    parser.add_argument("--offline", action="store_true", help="Fail instead of downloading if the cache is missing")
+    args = parser.parse_args()
 
-# Add labels to contours
-ax.clabel(contours, inline=True, fontsize=8)
+    if args.precompute:
+        precompute_boundaries(args.scale)
+        return
 
-# Add titles and labels if needed
-ax.set_title('High-Level Contour Map of the United States')
+    boundaries = load_boundaries(args.scale, offline=args.offline)
+    for resolution in args.resolution:
+        plot_contours(boundaries, resolution, args.levels, args.chunk_rows,
+                      args.output.format(resolution=resolution))
 
-# Show the plot
-plt.show()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,122 @@
+import argparse
 import csv
+import hashlib
+import json
+import os
 from collections import Counter
+
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 
-def count_types(csv_filename):
+root_dir = os.path.dirname(os.path.abspath(__file__))
+metadata_csv = os.path.join(root_dir, 'single2k_metadata.csv')
+
+# Counts of every (source, category, type) combination, keyed by the hash of the metadata file
+cache_dir = os.path.join(root_dir, '.cache', 'massvis')
+
+dimensions = ['source', 'category', 'type']
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_joint_counts(csv_filename):
+    """
+    Counts every (source, category, type) combination in one streaming pass over the metadata.
+    newline='' lets the csv module handle the classic Mac '\\r' line endings of single2k_metadata.csv.
+    """
+    joint = Counter()
     with open(csv_filename, mode='r', newline='', encoding='utf-8') as csvfile:
-        csvreader = csv.DictReader(csvfile, fieldnames=['filename', 'source', 'category', 'type', 'url', 'comments'])
-        
-        # Skip the header row
-        next(csvreader)
-        
-        # Collect all the types
-        types = [row['type'] for row in csvreader]
-    
-    # Count frequencies of each type
-    type_frequencies = Counter(types)
-    
-    return dict(type_frequencies)
-
-def plot_type_frequencies(type_frequencies):
-    types = list(type_frequencies.keys())
+        for row in csv.DictReader(csvfile):
+            joint[tuple((row[dimension] or '').strip() for dimension in dimensions)] += 1
+    return joint
+
+def joint_counts(csv_filename, use_cache=True):
+    """
+    Returns the (source, category, type) counts of a metadata file, read from the cache if the file is unchanged.
+    """
+    if not use_cache:
+        return read_joint_counts(csv_filename)
+
+    cache_path = os.path.join(cache_dir, f"{file_hash(csv_filename)}.json")
+    if os.path.exists(cache_path):
+        with open(cache_path, mode='r', encoding='utf-8') as cache_file:
+            return Counter({tuple(key): count for key, count in json.load(cache_file)})
+
+    joint = read_joint_counts(csv_filename)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, mode='w', encoding='utf-8') as cache_file:
+        json.dump([[list(key), count] for key, count in joint.items()], cache_file)
+    os.replace(tmp_path, cache_path)
+    return joint
+
+def group_counts(csv_filename, by=('type',), where=None, use_cache=True):
+    """
+    Counts the charts grouped by any combination of source/category/type, optionally restricted to a subset.
+
+    Parameters:
+    by (sequence): Dimensions to group by, e.g. ('source', 'type').
+    where (dict): {dimension: value or list of values} the charts must match, e.g. {'category': 'N'}.
+
+    Returns a dict {value: count} for a single dimension, {(value, ...): count} otherwise, most frequent first.
+    """
+    for dimension in list(by) + list(where or {}):
+        if dimension not in dimensions:
+            raise ValueError(f"Unknown dimension {dimension!r}, expected one of {dimensions}")
+    allowed = {dimensions.index(dimension): {values} if isinstance(values, str) else set(values)
+               for dimension, values in (where or {}).items()}
+    positions = [dimensions.index(dimension) for dimension in by]
+
+    grouped = Counter()
+    for key, count in joint_counts(csv_filename, use_cache).items():
+        if all(key[position] in values for position, values in allowed.items()):
+            group = tuple(key[position] for position in positions)
+            grouped[group[0] if len(group) == 1 else group] += count
+    return dict(grouped.most_common())
+
+def count_types(csv_filename):
+    return group_counts(csv_filename, by=('type',))
+
+def plot_type_frequencies(type_frequencies, output_file='massVisTypes.png', xlabel='Type'):
+    types = [' / '.join(key) if isinstance(key, tuple) else key for key in type_frequencies.keys()]
     frequencies = list(type_frequencies.values())
-    
-    plt.figure(figsize=(10, 6))
+
+    plt.figure(figsize=(max(10, len(types) * 0.4), 6))
     plt.bar(types, frequencies, color='skyblue')
-    plt.xlabel('Type')
+    plt.xlabel(xlabel)
     plt.ylabel('Frequency')
-    plt.title('Frequency of Types')
-    plt.xticks(rotation=45)
+    plt.title(f'Frequency of {xlabel}')
+    plt.xticks(rotation=45, ha='right')
     plt.tight_layout()
-    plt.show()
+    plt.savefig(output_file)
+    plt.close()
+    print(f"Saved plot: {output_file}")
+
+def parse_where(conditions):
+    where = {}
+    for condition in conditions:
+        dimension, _, value = condition.partition('=')
+        where.setdefault(dimension, []).append(value)
+    return where
 
 def main():
-    csv_filename = './single2k_metadata.csv'  # Replace with your CSV file name
-    type_frequencies = count_types(csv_filename)
-    print(type_frequencies)
-    plot_type_frequencies(type_frequencies)
+    parser = argparse.ArgumentParser(description="Count the MassVis charts by source, category and/or type.")
+    parser.add_argument("--csv", default=metadata_csv, help="MassVis metadata CSV")
+    parser.add_argument("--by", nargs='+', default=['type'], choices=dimensions, help="Dimensions to group by")
+    parser.add_argument("--where", nargs='*', default=[], metavar='DIMENSION=VALUE',
+                        help="Only count charts matching these values (repeat a dimension to allow several)")
+    parser.add_argument("--output", default='massVisTypes.png', help="Where to save the bar chart")
+    parser.add_argument("--no-cache", action="store_true", help="Re-read the CSV instead of using the cached counts")
+    args = parser.parse_args()
+
+    frequencies = group_counts(args.csv, by=args.by, where=parse_where(args.where), use_cache=not args.no_cache)
+    print(frequencies)
+    plot_type_frequencies(frequencies, args.output, xlabel=' / '.join(dimension.capitalize() for dimension in args.by))
 
 if __name__ == '__main__':
     main()